@@ -1,20 +1,217 @@
 import json
 import re
-import PyPDF2
 import io
-import google.generativeai as genai
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from compress import compress_email, compress_pdf_text, PAGE_BREAK, REPLY_CHAIN_RE
+from convert import to_float
+from llm_client import LLMUnavailableError, InvalidModelOutputError, ModelCascade, ModelTier
+
+# Message boundary patterns for mbox files and concatenated RFC 822 dumps
+_MBOX_FROM_RE = re.compile(r'^From \S+')
+_MBOX_ESCAPED_FROM_RE = re.compile(r'^>(>*From )')
+_HEADER_RE = re.compile(r'^[A-Za-z][A-Za-z0-9-]*:[ \t]')
+_HEADER_CONTINUATION_RE = re.compile(r'^[ \t]+\S')
+_FROM_HEADER_RE = re.compile(r'^From:', re.IGNORECASE)
+# Only sent messages carry these; quoted reply headers do not
+_MESSAGE_START_RE = re.compile(r'^(Date|Message-ID):', re.IGNORECASE)
+# Outlook writes Sent: in the header of quoted messages
+_SENT_HEADER_RE = re.compile(r'^Sent:', re.IGNORECASE)
+# Forward markers of Gmail and Outlook ("---------- Forwarded message ---------",
+# "-----Forwarded Message-----") and of Apple Mail
+_FORWARDED_RE = re.compile(r'^(-{2,}\s*Forwarded message\s*-{2,}|Begin forwarded message:\s*$)', re.IGNORECASE)
+
+# Urgency keywords in subject and body, checked from most to least urgent
+URGENCY_KEYWORDS = {
+    "HIGH": ["urgent", "critical", "immediate", "asap", "emergency"],
+    "MEDIUM": ["important", "attention", "priority", "needed"],
+    "LOW": ["fyi", "update", "information"]
+}
+
+
+def determine_urgency(content):
+    """Determine urgency level from keywords in the content"""
+    content_lower = content.lower()
+    
+    # Check for explicit urgency indicators
+    for level, keywords in URGENCY_KEYWORDS.items():
+        if any(keyword in content_lower for keyword in keywords):
+            return level
+            
+    # Default to MEDIUM if no indicators found
+    return "MEDIUM"
+
+
+# Asked of every extraction prompt; low values escalate to the next model tier
+CONFIDENCE_FIELD = "- confidence: A number from 0 to 1 for how sure you are that the extraction is complete and correct"
+
+# Fields an invoice extraction must include, or the next model tier is asked
+INVOICE_REQUIRED_FIELDS = ["vendor_name", "total_amount"]
+
+_INVOICE_RE = re.compile(r'\binvoice\b', re.IGNORECASE)
+
+# Characters read for intent detection before compression; the prompt gets the first 1500 after
+INTENT_SCAN_CHARS = 6000
+
+
+def as_cascade(model):
+    """Use a model as a cascade; a single model gets the three JSON attempts it always had"""
+    if isinstance(model, ModelCascade):
+        return model
+    return ModelCascade([ModelTier("default", model, attempts=3)])
+
+
+def validate_invoice(entities):
+    """Problems with an extracted invoice, e.g. line items not adding up to the total"""
+    items = entities.get("line_items")
+    expected = to_float(entities.get("subtotal") or entities.get("total_amount") or "")
+    if not isinstance(items, list) or not items or expected is None:
+        return []
+
+    line_totals = []
+    for item in items:
+        if not isinstance(item, dict):
+            return []
+        amount = to_float(item.get("total") or item.get("amount") or "")
+        if amount is None:
+            quantity = to_float(item.get("quantity") or "")
+            price = to_float(item.get("unit_price") or item.get("price") or "")
+            if quantity is None or price is None:
+                # Cannot tell either way
+                return []
+            amount = quantity * price
+        line_totals.append(amount)
+
+    if abs(sum(line_totals) - expected) > max(0.01, 0.01 * abs(expected)):
+        return [f"Line items sum to {sum(line_totals):.2f}, expected {expected:.2f}"]
+    return []
+
+
+def as_text(content, limit=None):
+    """Decode document content (str, bytes or a memory-mapped upload) to text"""
+    if isinstance(content, str):
+        return content
+    if limit is not None:
+        # A UTF-8 character takes at most 4 bytes
+        content = content[:limit * 4]
+    return bytes(content).decode('utf-8', errors='ignore')
+
+
+def split_email_messages(content):
+    """Yield the individual messages of an mbox file or concatenated email dump"""
+    content = as_text(content)
+
+    lines = io.StringIO(content)
+    if _MBOX_FROM_RE.match(content.lstrip()):
+        yield from _split_mbox(lines)
+    else:
+        yield from _split_concatenated(lines)
+
+
+def _split_mbox(lines):
+    """Split mbox content on 'From ' envelope lines"""
+    current = []
+    previous_blank = True
+    for line in lines:
+        if previous_blank and _MBOX_FROM_RE.match(line):
+            if ''.join(current).strip():
+                yield ''.join(current)
+            # The envelope line is not part of the message itself
+            current = []
+            continue
+        # Undo mboxrd quoting of body lines that start with 'From '
+        current.append(_MBOX_ESCAPED_FROM_RE.sub(r'\1', line))
+        previous_blank = not line.strip()
+
+    if ''.join(current).strip():
+        yield ''.join(current)
+
+
+def _split_concatenated(lines):
+    """Split concatenated messages on RFC 822 header blocks containing a From: header"""
+    current = []
+    block = []
+    previous_blank = True
+    for line in lines:
+        if block:
+            if not line.strip():
+                # End of a candidate header block
+                if _is_message_header_block(block) and ''.join(current).strip() and not _starts_quote(current):
+                    yield ''.join(current)
+                    current = []
+                current.extend(block)
+                current.append(line)
+                block = []
+                previous_blank = True
+            elif _HEADER_RE.match(line) or _HEADER_CONTINUATION_RE.match(line):
+                block.append(line)
+            else:
+                # Body text directly after header-like lines, not a new message
+                current.extend(block)
+                current.append(line)
+                block = []
+                previous_blank = False
+        elif previous_blank and _HEADER_RE.match(line):
+            block.append(line)
+        else:
+            current.append(line)
+            previous_blank = not line.strip()
+
+    if block:
+        if _is_message_header_block(block) and ''.join(current).strip() and not _starts_quote(current):
+            yield ''.join(current)
+            current = []
+        current.extend(block)
+
+    if ''.join(current).strip():
+        yield ''.join(current)
+
+
+def _is_message_header_block(block):
+    """Check if a block of lines looks like the header section of a sent message
+    
+    Quoted reply headers also have From:, but not Date:/Message-ID: without Sent:.
+    """
+    headers = [line for line in block if _HEADER_RE.match(line)]
+    return (len(headers) >= 2
+            and any(_FROM_HEADER_RE.match(line) for line in headers)
+            and any(_MESSAGE_START_RE.match(line) for line in headers)
+            and not any(_SENT_HEADER_RE.match(line) for line in headers))
+
+
+def _starts_quote(lines):
+    """Check if the last text line introduces quoted or forwarded history"""
+    last = next((line.strip() for line in reversed(lines) if line.strip()), "")
+    return bool(REPLY_CHAIN_RE.match(last) or _FORWARDED_RE.match(last))
+
 
 class ClassifierAgent:
-    def __init__(self, model):
+    def __init__(self, model, compress=True):
         self.model = model
+        self.compress = compress
         
     def classify_document(self, file_content, file_name):
         """Classify document format and intent"""
+        classification = self.classify_format(file_content, file_name)
+        
+        # Use LLM to determine intent
+        if classification["intent"] is None:
+            classification["intent"] = self._detect_intent(file_content, classification["format"])
+        
+        return classification
+    
+    def classify_format(self, file_content, file_name):
+        """Classify the document format locally, without calling the LLM
+        
+        The intent is only known at this point for multi-message containers
+        ("Mailbox"); otherwise it is None and left to _detect_intent.
+        """
         # Determine format based on file extension
         format_type = self._detect_format(file_name, file_content)
         
-        # Use LLM to determine intent
-        intent = self._detect_intent(file_content, format_type)
+        # Containers with several messages are classified per message later
+        intent = "Mailbox" if format_type == "Email" and self._is_mailbox(file_content) else None
         
         return {
             "format": format_type,
@@ -35,17 +232,25 @@ class ClassifierAgent:
     
     def _looks_like_email(self, content):
         """Check if content looks like an email"""
-        if isinstance(content, bytes):
-            content = content.decode('utf-8', errors='ignore')
+        content = as_text(content)
             
         # Simple check for email format (From, Subject, etc.)
         email_patterns = [r'From:\s', r'Subject:\s', r'Date:\s']
         return any(re.search(pattern, content) for pattern in email_patterns)
     
+    def _is_mailbox(self, content):
+        """Check if content holds more than one email message"""
+        messages = split_email_messages(content)
+        next(messages, None)
+        return next(messages, None) is not None
+    
     def _detect_intent(self, content, format_type):
         """Use LLM to detect document intent"""
-        if isinstance(content, bytes):
-            content = content.decode('utf-8', errors='ignore')
+        # Only the start of the document goes into the prompt, without quoted history and signatures
+        if self.compress and format_type in ("Email", "Text"):
+            content = compress_email(as_text(content, limit=INTENT_SCAN_CHARS)).text
+        else:
+            content = as_text(content, limit=1500)
             
         prompt = f"""
         Analyze the following document and determine its intent. 
@@ -57,7 +262,11 @@ class ClassifierAgent:
         Return only the intent as a single word or short phrase.
         """
         
-        response = self.model.generate_content(prompt)
+        try:
+            response = self.model.generate_content(prompt)
+        except LLMUnavailableError:
+            # Model is throttled or down; fall back to keyword matching
+            return self._guess_intent(content)
         intent = response.text.strip()
         
         # Normalize common intents
@@ -71,18 +280,35 @@ class ClassifierAgent:
         }
         
         return intent_mapping.get(intent.lower(), intent)
+    
+    def _guess_intent(self, content):
+        """Guess the intent from keywords when the LLM is unavailable"""
+        intent_keywords = {
+            "RFQ": ["request for quote", "request for quotation", "rfq", "quotation"],
+            "Invoice": ["invoice", "total due", "amount due"],
+            "Complaint": ["complaint", "defective", "refund", "not working"],
+            "Regulation": ["regulation", "compliance", "directive"]
+        }
+        
+        content_lower = content[:1500].lower()
+        for intent, keywords in intent_keywords.items():
+            if any(keyword in content_lower for keyword in keywords):
+                return intent
+                
+        return "Unknown"
 
 
 class JSONAgent:
     def __init__(self, model):
         self.model = model
+        self.cascade = as_cascade(model)
         
     def process_json(self, json_content):
         """Process JSON document and extract relevant fields"""
         try:
             # Parse JSON content
-            if isinstance(json_content, bytes):
-                json_content = json_content.decode('utf-8')
+            if not isinstance(json_content, str):
+                json_content = bytes(json_content).decode('utf-8')
                 
             data = json.loads(json_content)
             
@@ -130,14 +356,12 @@ class JSONAgent:
         Return a JSON object with:
         1. The key fields and their values
         2. Any anomalies or missing fields that would be expected
+        3. A "confidence" number from 0 to 1 for how sure you are of the result
         """
         
-        response = self.model.generate_content(prompt)
-        
         try:
-            result = json.loads(response.text)
-            return result
-        except json.JSONDecodeError:
+            return self.cascade.generate_json(prompt)
+        except (InvalidModelOutputError, LLMUnavailableError):
             # Fallback if LLM doesn't return valid JSON
             return {
                 "status": "processed",
@@ -147,13 +371,14 @@ class JSONAgent:
 
 
 class EmailAgent:
-    def __init__(self, model):
+    def __init__(self, model, compress=True):
         self.model = model
+        self.compress = compress
+        self.cascade = as_cascade(model)
         
     def process_email(self, email_content):
         """Process email content and extract metadata"""
-        if isinstance(email_content, bytes):
-            email_content = email_content.decode('utf-8', errors='ignore')
+        email_content = as_text(email_content)
             
         # Extract basic email metadata
         sender = self._extract_sender(email_content)
@@ -166,6 +391,35 @@ class EmailAgent:
             "entities": entities
         }
     
+    def process_messages(self, container_content, classifier=None, max_workers=4):
+        """Split a multi-message container and process the messages concurrently
+        
+        Results are yielded in message order while later messages are still
+        being processed, so large containers are never held in flight at once.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for index, message in enumerate(split_email_messages(container_content)):
+                pending.append(executor.submit(self._process_message, index, message, classifier))
+                if len(pending) >= max_workers * 2:
+                    yield pending.popleft().result()
+            
+            while pending:
+                yield pending.popleft().result()
+    
+    def _process_message(self, index, message, classifier):
+        """Classify and extract a single message from a container"""
+        intent = classifier._detect_intent(message, "Email") if classifier else None
+        
+        return {
+            "index": index,
+            "classification": {
+                "format": "Email",
+                "intent": intent
+            },
+            "result": self.process_email(message)
+        }
+    
     def _extract_sender(self, content):
         """Extract sender from email content"""
         sender_match = re.search(r'From:\s*([^\n]+)', content)
@@ -175,28 +429,15 @@ class EmailAgent:
     
     def _determine_urgency(self, content):
         """Determine urgency level from email content"""
-        # Check for urgency keywords in subject and body
-        urgency_keywords = {
-            "HIGH": ["urgent", "critical", "immediate", "asap", "emergency"],
-            "MEDIUM": ["important", "attention", "priority", "needed"],
-            "LOW": ["fyi", "update", "information"]
-        }
-        
-        content_lower = content.lower()
-        
-        # Check for explicit urgency indicators
-        for level, keywords in urgency_keywords.items():
-            if any(keyword in content_lower for keyword in keywords):
-                return level
-                
-        # Default to MEDIUM if no indicators found
-        return "MEDIUM"
+        return determine_urgency(content)
     
     def _extract_entities(self, content):
         """Extract key entities from email content using LLM"""
+        # Quoted replies, signatures and disclaimers only add tokens
+        prompt_content = compress_email(content).text if self.compress else content
         prompt = f"""
         Extract key entities from this email in a structured format:
-        {content}
+        {prompt_content}
         
         Analyze the content carefully and extract ALL of the following that apply:
         - sender_name: The name of the person sending the email
@@ -207,35 +448,17 @@ class EmailAgent:
         - deadline: Any mentioned deadlines or dates
         - urgency_indicators: Words indicating urgency (like 'urgent', 'asap', etc.)
         - requested_action: What action is being requested
+        {CONFIDENCE_FIELD}
         
         Return ONLY a valid JSON object with these fields. If a field is not applicable, use null or omit it.
         """
         
-        # Make multiple attempts to get valid JSON
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            try:
-                response = self.model.generate_content(prompt)
-                # Try to extract JSON from the response
-                text = response.text.strip()
-                # Handle potential markdown code blocks
-                if "```json" in text:
-                    text = text.split("```json")[1].split("```")[0].strip()
-                elif "```" in text:
-                    text = text.split("```")[1].split("```")[0].strip()
-                
-                entities = json.loads(text)
-                return entities
-            except json.JSONDecodeError:
-                # If we're on the last attempt, return a fallback
-                if attempt == max_attempts - 1:
-                    # Create a simple structured response as fallback
-                    return self._create_fallback_entities(content)
-                # Otherwise try again with a more explicit prompt
-                prompt += "\n\nIMPORTANT: Return ONLY a valid JSON object with no additional text."
-        
-        # This should never be reached due to the fallback, but just in case
-        return {"error": "Could not extract structured entities"}
+        # Cheaper model tiers first; escalated when the answer is unusable
+        try:
+            return self.cascade.generate_json(prompt)
+        except (LLMUnavailableError, InvalidModelOutputError):
+            # Model is down or no tier produced valid JSON
+            return self._create_fallback_entities(content)
     
     def _create_fallback_entities(self, content):
         """Create a fallback structured response when LLM fails to return valid JSON"""
@@ -269,8 +492,10 @@ class EmailAgent:
 
 
 class PDFAgent:
-    def __init__(self, model):
+    def __init__(self, model, compress=True):
         self.model = model
+        self.compress = compress
+        self.cascade = as_cascade(model)
         
     def process_pdf(self, pdf_content):
         """Process PDF content and extract information"""
@@ -291,12 +516,17 @@ class PDFAgent:
     def _pdf_to_text(self, pdf_content):
         """Convert PDF content to text"""
         try:
-            pdf_file = io.BytesIO(pdf_content)
+            # Imported on first use so sessions without PDFs never load it
+            import PyPDF2
+            
+            # Memory-mapped uploads are read in place instead of copied
+            pdf_file = pdf_content if hasattr(pdf_content, 'read') else io.BytesIO(pdf_content)
             pdf_reader = PyPDF2.PdfReader(pdf_file)
             text = ""
             
             for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+                # Page breaks let the compressor find repeated page headers and footers
+                text += page.extract_text() + "\n" + PAGE_BREAK + "\n"
                 
             return text
         except Exception as e:
@@ -318,46 +548,34 @@ class PDFAgent:
     
     def _extract_entities(self, text_content):
         """Extract key entities from PDF text using LLM"""
+        # Page headers, footers and numbers are dropped so more of the content fits
+        prompt_text = compress_pdf_text(text_content).text if self.compress else text_content
         prompt = f"""
         Extract key information from this document text in a structured format:
-        {text_content[:2000]}  # Increased content length for better context
+        {prompt_text[:2000]}  # Increased content length for better context
         
         Analyze the content carefully and extract ALL of the following that apply:
         - invoice_number: Any invoice or reference numbers
         - vendor_name: The company issuing the document
         - client_name: The company receiving the document
         - total_amount: The total monetary amount (as a number without currency symbols)
-        - line_items: Array of items with quantities and prices
+        - line_items: Array of items with quantity, unit_price and total
         - payment_terms: Payment terms if mentioned
         - issue_date: When the document was issued
         - due_date: When payment or action is due
+        - subtotal: The amount before tax and shipping, if stated
+        {CONFIDENCE_FIELD}
         
         Return ONLY a valid JSON object with these fields. If a field is not applicable, use null or omit it.
         """
         
-        # Make multiple attempts to get valid JSON
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            try:
-                response = self.model.generate_content(prompt)
-                # Try to extract JSON from the response
-                text = response.text.strip()
-                # Handle potential markdown code blocks
-                if "```json" in text:
-                    text = text.split("```json")[1].split("```")[0].strip()
-                elif "```" in text:
-                    text = text.split("```")[1].split("```")[0].strip()
-                
-                entities = json.loads(text)
-                return entities
-            except json.JSONDecodeError:
-                # If we're on the last attempt, return a fallback
-                if attempt == max_attempts - 1:
-                    return self._create_fallback_entities(text_content)
-                # Otherwise try again with a more explicit prompt
-                prompt += "\n\nIMPORTANT: Return ONLY a valid JSON object with no additional text."
-        
-        return {"error": "Could not extract structured entities"}
+        # Invoices must name the vendor and total, and their line items must add up
+        required = INVOICE_REQUIRED_FIELDS if _INVOICE_RE.search(text_content) else ()
+        try:
+            return self.cascade.generate_json(prompt, required=required, validate=validate_invoice)
+        except (LLMUnavailableError, InvalidModelOutputError):
+            # Model is down or no tier produced valid JSON
+            return self._create_fallback_entities(text_content)
         
     def _create_fallback_entities(self, text_content):
         """Create a fallback structured response when LLM fails to return valid JSON"""
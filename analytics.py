@@ -0,0 +1,136 @@
+"""Incrementally maintained document analytics
+
+Every stored document updates hourly counter hashes, HyperLogLogs of unique
+senders and top-sender/vendor sorted sets in the same transaction as the
+document itself. The dashboard then reads one hash and one HLL per hour
+instead of scanning the stored documents.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from convert import to_float
+
+BUCKET_FORMAT = "%Y%m%d%H"
+# Hourly buckets are kept for 90 days
+BUCKET_TTL_SECONDS = 90 * 24 * 3600
+TOP_N = 10
+
+
+def hour_bucket(moment):
+    return moment.strftime(BUCKET_FORMAT)
+
+
+def recent_buckets(hours, now=None):
+    """Bucket names for the last `hours` hours, oldest first"""
+    now = now or datetime.now()
+    return [hour_bucket(now - timedelta(hours=h)) for h in reversed(range(hours))]
+
+
+def document_facts(format_type, intent, extracted_data):
+    """The values of a processed document that the analytics track"""
+    if not isinstance(extracted_data, dict):
+        extracted_data = {}
+    entities = extracted_data.get("entities") or extracted_data.get("fields") or {}
+    if not isinstance(entities, dict):
+        entities = {}
+
+    invoice_total = None
+    if intent == "Invoice":
+        total = entities.get("total_amount", entities.get("total"))
+        invoice_total = to_float(total) if total is not None else None
+
+    return {
+        "format": format_type,
+        "intent": intent,
+        "urgency": extracted_data.get("urgency"),
+        "sender": extracted_data.get("sender"),
+        "vendor": entities.get("vendor_name") or entities.get("vendor"),
+        "invoice_total": invoice_total,
+        "has_anomalies": bool(extracted_data.get("anomalies"))
+    }
+
+
+def record_document(pipe, facts, moment):
+    """Queue the counter updates for one document on a Redis pipeline"""
+    bucket = hour_bucket(moment)
+    hour_key = f"stats:hour:{bucket}"
+
+    pipe.hincrby(hour_key, "docs", 1)
+    for dimension in ("format", "intent", "urgency"):
+        if facts[dimension]:
+            pipe.hincrby(hour_key, f"{dimension}:{facts[dimension]}", 1)
+    if facts["has_anomalies"]:
+        pipe.hincrby(hour_key, "anomalies", 1)
+    if facts["invoice_total"] is not None:
+        pipe.hincrby(hour_key, "invoices", 1)
+        pipe.hincrbyfloat(hour_key, "invoice_total", facts["invoice_total"])
+    pipe.expire(hour_key, BUCKET_TTL_SECONDS)
+
+    if facts["sender"] and facts["sender"] != "Unknown":
+        pipe.pfadd(f"stats:senders:{bucket}", facts["sender"])
+        pipe.expire(f"stats:senders:{bucket}", BUCKET_TTL_SECONDS)
+        pipe.pfadd("stats:senders:all", facts["sender"])
+        pipe.zincrby("stats:top_senders", 1, facts["sender"])
+    if facts["vendor"]:
+        pipe.zincrby("stats:top_vendors", 1, facts["vendor"])
+
+
+def read_dashboard(redis_client, hours=24, now=None):
+    """Aggregates over the last `hours` hours; one hash and one HLL read per hour"""
+    buckets = recent_buckets(hours, now)
+
+    pipe = redis_client.pipeline(transaction=False)
+    for bucket in buckets:
+        pipe.hgetall(f"stats:hour:{bucket}")
+    pipe.pfcount(*[f"stats:senders:{bucket}" for bucket in buckets])
+    pipe.pfcount("stats:senders:all")
+    pipe.zrevrange("stats:top_senders", 0, TOP_N - 1, withscores=True)
+    pipe.zrevrange("stats:top_vendors", 0, TOP_N - 1, withscores=True)
+    results = pipe.execute()
+
+    hourly = [_decode_counters(counters) for counters in results[:hours]]
+    unique_senders, unique_senders_all, top_senders, top_vendors = results[hours:]
+
+    return summarize(
+        buckets,
+        hourly,
+        unique_senders,
+        unique_senders_all,
+        [(_decode(name), int(score)) for name, score in top_senders],
+        [(_decode(name), int(score)) for name, score in top_vendors]
+    )
+
+
+def summarize(buckets, hourly, unique_senders, unique_senders_all, top_senders, top_vendors):
+    """Combine hourly counters into the dashboard view"""
+    totals = Counter()
+    for counters in hourly:
+        totals.update(counters)
+
+    def breakdown(dimension):
+        prefix = f"{dimension}:"
+        return {k[len(prefix):]: int(v) for k, v in totals.items() if k.startswith(prefix)}
+
+    docs = int(totals["docs"])
+    return {
+        "docs": docs,
+        "docs_per_hour": {bucket: int(counters.get("docs", 0)) for bucket, counters in zip(buckets, hourly)},
+        "intents": breakdown("intent"),
+        "formats": breakdown("format"),
+        "urgencies": breakdown("urgency"),
+        "anomaly_rate": totals["anomalies"] / docs if docs else 0.0,
+        "invoices": int(totals["invoices"]),
+        "invoice_total": totals["invoice_total"],
+        "unique_senders": unique_senders,
+        "unique_senders_all_time": unique_senders_all,
+        "top_senders": top_senders,
+        "top_vendors": top_vendors
+    }
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _decode_counters(counters):
+    return {_decode(k): float(v) for k, v in counters.items()}
@@ -0,0 +1,251 @@
+"""Headless HTTP ingestion API
+
+Serves the document pipeline to integrations such as mail gateways and ERPs,
+next to the Streamlit UI and sharing its storage:
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    POST /documents            process one uploaded file (?wait=false returns 202 at once)
+    POST /documents/batch      process several files, streaming NDJSON results as they finish
+    GET  /documents/{id}       stored result of a document
+    GET  /health               liveness, storage backend and model circuit state
+    GET  /metrics              admission, latency, model and compression stats
+
+Documents run on a bounded thread pool. Once API_MAX_IN_FLIGHT documents are
+running or waiting, new submissions get 429 with Retry-After instead of
+queueing without limit.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+import compress
+import resources
+from ingest import UploadTooLargeError, ingest_upload
+from memory import RedisMemory
+
+load_dotenv()
+
+# Documents processed at once, and processed or waiting before submissions are refused
+API_WORKERS = int(os.environ.get("API_WORKERS", 16))
+API_MAX_IN_FLIGHT = int(os.environ.get("API_MAX_IN_FLIGHT", 64))
+RETRY_AFTER_SECONDS = 1
+
+# Recent request latencies kept for the percentiles in /metrics
+LATENCY_WINDOW = 1000
+
+
+class Saturated(Exception):
+    """Raised when accepting more documents would exceed the in-flight limit"""
+
+
+class AdmissionLimiter:
+    """Count of documents admitted but not yet finished, capped at `limit`
+
+    Only used from the event loop, so it needs no lock.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def acquire(self, count=1):
+        """Admit `count` documents or raise Saturated"""
+        if self.in_flight + count > self.limit:
+            self.rejected += count
+            raise Saturated()
+        self.in_flight += count
+        self.accepted += count
+
+    def release(self, count=1):
+        self.in_flight -= count
+
+
+app = FastAPI(title="Document Processing API")
+executor = ThreadPoolExecutor(max_workers=API_WORKERS)
+admission = AdmissionLimiter(API_MAX_IN_FLIGHT)
+latencies = deque(maxlen=LATENCY_WINDOW)
+outcomes = {"completed": 0, "failed": 0}
+# Tasks of documents submitted with wait=false that are still being processed
+processing = {}
+
+
+@app.exception_handler(Saturated)
+async def saturated_handler(request, exc):
+    return JSONResponse(
+        {"detail": "Too many documents in flight; retry later"},
+        status_code=429,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+
+@app.exception_handler(UploadTooLargeError)
+async def too_large_handler(request, exc):
+    return JSONResponse({"detail": str(exc)}, status_code=413)
+
+
+async def ingest(upload):
+    """Copy an upload to memory or a spool file; FastAPI closes uploads once the endpoint returns"""
+    return await asyncio.to_thread(ingest_upload, upload.file, upload.filename, declared_size=upload.size)
+
+
+def process(ingested, document_id):
+    """Run the pipeline on an ingested document; runs on the worker pool"""
+    output = resources.get_pipeline(concurrency=API_WORKERS).process(document_id, ingested.content, ingested.name)
+    return {
+        "id": document_id,
+        "file_name": ingested.name,
+        "classification": output["classification"],
+        "result": output["result"],
+        "timings": output["timings"]
+    }
+
+
+async def run_admitted(ingested, document_id):
+    """Process an admitted document off the event loop, then release its slot"""
+    start = time.perf_counter()
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(executor, process, ingested, document_id)
+    except Exception:
+        outcomes["failed"] += 1
+        raise
+    finally:
+        ingested.close()
+        admission.release()
+
+    outcomes["completed"] += 1
+    latencies.append(time.perf_counter() - start)
+    return result
+
+
+@app.post("/documents")
+async def submit_document(file: UploadFile = File(...), wait: bool = Query(True)):
+    """Process one document; with wait=false, respond 202 and process in the background"""
+    admission.acquire()
+    try:
+        ingested = await ingest(file)
+    except Exception:
+        admission.release()
+        raise
+    document_id = str(uuid.uuid4())
+
+    if wait:
+        return await run_admitted(ingested, document_id)
+
+    processing[document_id] = asyncio.create_task(run_admitted(ingested, document_id))
+    processing[document_id].add_done_callback(lambda task: _finished(document_id, task))
+    return JSONResponse({"id": document_id, "status": "processing"}, status_code=202)
+
+
+def _finished(document_id, task):
+    """Forget a background document; failures are already counted in /metrics"""
+    processing.pop(document_id, None)
+    if not task.cancelled():
+        task.exception()
+
+
+@app.post("/documents/batch")
+async def submit_batch(files: list[UploadFile] = File(...)):
+    """Process several documents concurrently, streaming one NDJSON line per document as it finishes
+
+    The whole batch is admitted or refused at once, so a 429 never leaves a
+    batch half processed. A batch that could never be admitted gets 413.
+    """
+    if len(files) > admission.limit:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batches are limited to {admission.limit} documents; split the batch"
+        )
+    admission.acquire(len(files))
+    ingested = []
+    try:
+        for upload in files:
+            ingested.append(await ingest(upload))
+    except Exception:
+        for document in ingested:
+            document.close()
+        admission.release(len(files))
+        raise
+
+    tasks = [asyncio.create_task(_batch_item(index, document)) for index, document in enumerate(ingested)]
+
+    async def results():
+        for task in asyncio.as_completed(tasks):
+            yield json.dumps(await task) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+async def _batch_item(index, ingested):
+    """One batch entry; failures are reported in its line rather than aborting the stream"""
+    file_name = ingested.name
+    try:
+        return dict(await run_admitted(ingested, str(uuid.uuid4())), index=index)
+    except Exception as e:
+        return {"index": index, "file_name": file_name, "error": str(e)}
+
+
+@app.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    """Stored result of a document, with the messages of a mailbox"""
+    memory = resources.get_memory()
+    document = await asyncio.to_thread(memory.get_document_data, document_id)
+    if document is None:
+        if document_id in processing:
+            return JSONResponse({"id": document_id, "status": "processing"}, status_code=202)
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    document = dict(document, id=document_id)
+    if document.get("intent") == "Mailbox":
+        document["messages"] = await asyncio.to_thread(memory.get_child_documents, document_id)
+    return document
+
+
+@app.get("/health")
+async def health():
+    memory = resources.get_memory()
+    if isinstance(memory, RedisMemory):
+        try:
+            await asyncio.to_thread(memory.redis_client.ping)
+        except Exception as e:
+            return JSONResponse({"status": "unavailable", "storage": "redis", "error": str(e)}, status_code=503)
+
+    return {
+        "status": "ok",
+        "storage": "redis" if isinstance(memory, RedisMemory) else "memory",
+        "model_circuit": resources.get_model().stats().get("circuit")
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    recent = sorted(latencies)
+
+    def percentile(p):
+        return recent[min(len(recent) - 1, int(p * len(recent)))] if recent else None
+
+    return {
+        "in_flight": admission.in_flight,
+        "max_in_flight": admission.limit,
+        "workers": API_WORKERS,
+        "accepted": admission.accepted,
+        "rejected": admission.rejected,
+        "completed": outcomes["completed"],
+        "failed": outcomes["failed"],
+        "latency_p50": percentile(0.5),
+        "latency_p95": percentile(0.95),
+        "latency_p99": percentile(0.99),
+        "model": resources.get_model().stats(),
+        "compression": compress.STATS.summary()
+    }
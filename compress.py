@@ -0,0 +1,354 @@
+"""Prompt compression for emails and extracted PDF text
+
+Strips material that carries no signal before it is sent to the model: quoted
+reply chains, signatures, legal disclaimers, noise and repeated headers,
+tracking query strings, runs of whitespace and PDF page headers/footers. The
+compressed text only ever keeps substrings of the original, so with
+keep_offsets every character can be mapped back to its original position.
+
+Compare extraction with and without compression on sample files:
+
+    python compress.py sample_inputs/*.txt
+"""
+import argparse
+import bisect
+import re
+import threading
+from collections import Counter
+
+# Headers worth keeping at the top of an email; everything else is transport noise
+KEEP_HEADERS = {"from", "to", "cc", "subject", "date", "sent"}
+
+_LINE_RE = re.compile(r'[^\n]*\n|[^\n]+')
+_HEADER_RE = re.compile(r'^([A-Za-z][A-Za-z0-9-]*):[ \t]')
+_CONTINUATION_RE = re.compile(r'^[ \t]+\S')
+
+# Start of the quoted history; everything after it is dropped
+REPLY_CHAIN_RE = re.compile(
+    r'^(On\s.{0,200}\swrote:\s*$'
+    r'|-{2,}\s*Original Message\s*-{2,}'
+    r'|_{10,}\s*$)',
+    re.IGNORECASE
+)
+# An Outlook-style quoted header inside the body: From: ... followed by Sent:/Date:
+_QUOTED_FROM_RE = re.compile(r'^\*?From:\*?\s')
+_QUOTED_SENT_RE = re.compile(r'^\*?(Sent|Date):\*?\s', re.IGNORECASE)
+_QUOTED_LINE_RE = re.compile(r'^\s*>')
+_SIGNATURE_RE = re.compile(r'^--\s?$')
+_MOBILE_SIGNATURE_RE = re.compile(r'^\s*Sent from my \w+', re.IGNORECASE)
+# A disclaimer drops the rest of its paragraph
+_DISCLAIMER_RE = re.compile(
+    r'(confidentiality notice|this (e-?mail|message)( and any attachments?)? (is|are|may be) '
+    r'(confidential|privileged|intended)|intended (solely |only )?for the (use of the )?'
+    r'(addressee|recipient|individual)|if you (are not the intended|have received this))',
+    re.IGNORECASE
+)
+
+_URL_QUERY_RE = re.compile(r'(https?://[^\s?#<>"]+)([?#][^\s<>"]*)')
+_SPACE_RUN_RE = re.compile(r'[ \t]{2,}')
+
+# Bare page numbers, "Page 3", "Page 3 of 10", "3/10"
+_PAGE_NUMBER_RE = re.compile(r'^\s*(page\s+)?\d+(\s*(of|/)\s*\d+)?\s*$', re.IGNORECASE)
+_DIGITS_RE = re.compile(r'\d+')
+_PAGE_WORD_RE = re.compile(r'\bpage\b', re.IGNORECASE)
+
+# Separates pages in text extracted from PDFs
+PAGE_BREAK = "\f"
+# Lines at the top and bottom of each page that are checked for repeats
+_PAGE_EDGE_LINES = 2
+
+
+class CompressedText:
+    """Compressed text and, optionally, where each of its characters came from"""
+
+    def __init__(self, text, original_length, spans=None):
+        self.text = text
+        self.original_length = original_length
+        # (compressed start, original start) of each run of kept characters
+        self.spans = spans
+
+    @property
+    def ratio(self):
+        """Original size over compressed size"""
+        return self.original_length / len(self.text) if self.text else 1.0
+
+    def original_offset(self, position):
+        """Position in the original text of the character at `position` in the compressed text"""
+        if self.spans is None:
+            raise ValueError("Offsets were not kept; compress with keep_offsets=True")
+        index = bisect.bisect_right(self.spans, (position, float("inf"))) - 1
+        compressed_start, original_start = self.spans[index]
+        return original_start + position - compressed_start
+
+
+class CompressionStats:
+    """Characters in and out of the compressor per kind of content, shared by the process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.original = Counter()
+        self.compressed = Counter()
+        self.calls = Counter()
+
+    def record(self, kind, result):
+        with self.lock:
+            self.calls[kind] += 1
+            self.original[kind] += result.original_length
+            self.compressed[kind] += len(result.text)
+
+    def summary(self):
+        """Calls, characters and overall compression ratio per kind"""
+        with self.lock:
+            return {
+                kind: {
+                    "calls": self.calls[kind],
+                    "original_chars": self.original[kind],
+                    "compressed_chars": self.compressed[kind],
+                    "ratio": self.original[kind] / self.compressed[kind] if self.compressed[kind] else 1.0
+                }
+                for kind in self.calls
+            }
+
+
+STATS = CompressionStats()
+
+
+class _Builder:
+    """Collects kept ranges of the original text"""
+
+    def __init__(self, original, keep_offsets):
+        self.original = original
+        self.keep_offsets = keep_offsets
+        self.parts = []
+        self.spans = []
+        self.length = 0
+        self.last_end = None
+
+    def keep(self, start, end):
+        if end <= start:
+            return
+        self.parts.append(self.original[start:end])
+        if self.keep_offsets and start != self.last_end:
+            self.spans.append((self.length, start))
+        self.length += end - start
+        self.last_end = end
+
+    def keep_line(self, start, line):
+        """Keep a line, collapsing runs of spaces and dropping URL query strings"""
+        position = 0
+        for match in _line_cuts(line):
+            self.keep(start + position, start + match[0])
+            position = match[1]
+        self.keep(start + position, start + len(line))
+
+    def ends_blank(self):
+        """Whether the text so far ends with an empty line"""
+        return not self.parts or self.parts[-1].strip() == ""
+
+    def result(self):
+        return CompressedText("".join(self.parts), len(self.original), self.spans if self.keep_offsets else None)
+
+
+def _line_cuts(line):
+    """(start, end) ranges to drop from a kept line, in order"""
+    cuts = [(m.start(2), m.end(2)) for m in _URL_QUERY_RE.finditer(line)]
+    # Keep the first character of each run of spaces
+    cuts += [(m.start() + 1, m.end()) for m in _SPACE_RUN_RE.finditer(line)]
+    cuts.sort()
+
+    merged = []
+    for start, end in cuts:
+        if merged and start < merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _lines(text):
+    """(offset, line) for each line, including its newline"""
+    return [(m.start(), m.group()) for m in _LINE_RE.finditer(text)]
+
+
+def compress_email(text, keep_offsets=False, record=True):
+    """Compress an email for a prompt"""
+    builder = _Builder(text, keep_offsets)
+    lines = _lines(text)
+    seen_headers = set()
+
+    index = 0
+    # Header block: keep the headers that carry meaning, once each
+    if lines and _HEADER_RE.match(lines[0][1]):
+        keep_current = False
+        while index < len(lines) and lines[index][1].strip():
+            start, line = lines[index]
+            header = _HEADER_RE.match(line)
+            if header:
+                key = line.strip().lower()
+                keep_current = header.group(1).lower() in KEEP_HEADERS and key not in seen_headers
+                seen_headers.add(key)
+            elif not _CONTINUATION_RE.match(line):
+                break
+            if keep_current:
+                builder.keep_line(start, line)
+            index += 1
+
+    in_disclaimer = False
+    while index < len(lines):
+        start, line = lines[index]
+        stripped = line.strip()
+
+        if not stripped:
+            in_disclaimer = False
+            if not builder.ends_blank():
+                builder.keep(start, start + len(line))
+        elif REPLY_CHAIN_RE.match(stripped) or _SIGNATURE_RE.match(line.rstrip("\n")) or _is_quoted_header(lines, index):
+            # Quoted history and signatures run to the end of the message
+            break
+        elif in_disclaimer or _DISCLAIMER_RE.search(line):
+            in_disclaimer = True
+        elif _QUOTED_LINE_RE.match(line) or _MOBILE_SIGNATURE_RE.match(line):
+            pass
+        elif _HEADER_RE.match(line) and stripped.lower() in seen_headers:
+            # Headers repeated in the body, e.g. by a forwarding client
+            pass
+        else:
+            builder.keep_line(start, line)
+        index += 1
+
+    result = builder.result()
+    if record:
+        STATS.record("email", result)
+    return result
+
+
+def _is_quoted_header(lines, index):
+    """An Outlook-style From:/Sent: block that starts the quoted history"""
+    if not _QUOTED_FROM_RE.match(lines[index][1]):
+        return False
+    following = [line for _, line in lines[index + 1:index + 4] if line.strip()]
+    return any(_QUOTED_SENT_RE.match(line) for line in following)
+
+
+def compress_pdf_text(text, keep_offsets=False, record=True):
+    """Compress text extracted from a PDF, with pages separated by PAGE_BREAK"""
+    builder = _Builder(text, keep_offsets)
+    pages = []
+    page = []
+    for start, line in _lines(text):
+        page.append((start, line))
+        if PAGE_BREAK in line:
+            pages.append(page)
+            page = []
+    if page:
+        pages.append(page)
+
+    repeated = _repeated_page_edges(pages)
+    # The first occurrence of a repeated header or footer is kept, e.g. the letterhead
+    seen = set()
+    for page in pages:
+        # Page numbers and headers/footers are only looked for at the page edges, and
+        # a bare number only on the outermost lines; elsewhere it is usually a table
+        # cell such as a quantity
+        edges = _page_edge_indexes(page, _PAGE_EDGE_LINES)
+        outermost = _page_edge_indexes(page, 1)
+        for index, (start, line) in enumerate(page):
+            stripped = line.replace(PAGE_BREAK, "").strip()
+            key = _page_edge_key(stripped)
+            if not stripped:
+                if not builder.ends_blank():
+                    builder.keep(start, start + len(line))
+            elif _PAGE_NUMBER_RE.match(stripped) and index in (outermost if stripped.isdigit() else edges):
+                continue
+            elif index in edges and key in seen:
+                continue
+            else:
+                if index in edges and key in repeated:
+                    seen.add(key)
+                builder.keep_line(start, line)
+
+    result = builder.result()
+    if record:
+        STATS.record("pdf", result)
+    return result
+
+
+def _repeated_page_edges(pages):
+    """Lines at the top or bottom of at least half the pages"""
+    if len(pages) < 2:
+        return set()
+
+    counts = Counter()
+    for page in pages:
+        edges = {page[index][1].replace(PAGE_BREAK, "").strip() for index in _page_edge_indexes(page, _PAGE_EDGE_LINES)}
+        counts.update(_page_edge_key(line) for line in edges)
+
+    return {line for line, count in counts.items() if count >= max(2, len(pages) / 2)}
+
+
+def _page_edge_indexes(page, count):
+    """Indexes of the first and last `count` non-blank lines of a page"""
+    content = [index for index, (_, line) in enumerate(page) if line.replace(PAGE_BREAK, "").strip()]
+    return set(content[:count] + content[-count:])
+
+
+def _page_edge_key(line):
+    """Lines mentioning the page match whatever the page number, e.g. "Report - Page 3 of 10" """
+    return _DIGITS_RE.sub("#", line) if _PAGE_WORD_RE.search(line) else line
+
+
+def agreement(expected, actual):
+    """Share of the expected (uncompressed) fields that the compressed path reproduced"""
+    if not isinstance(expected, dict) or not isinstance(actual, dict):
+        return 1.0 if expected == actual else 0.0
+    fields = [key for key, value in expected.items() if value not in (None, "", [], {}) and key != "confidence"]
+    if not fields:
+        return 1.0
+    matches = sum(_normalize(expected[key]) == _normalize(actual.get(key)) for key in fields)
+    return matches / len(fields)
+
+
+def _normalize(value):
+    return re.sub(r'\s+', ' ', str(value)).strip().lower()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check extraction with prompt compression against the uncompressed path")
+    parser.add_argument("files", nargs="+", help="Email or PDF files")
+    args = parser.parse_args()
+
+    # Imported here so the compressor itself has no dependencies
+    from dotenv import load_dotenv
+    from agents import ClassifierAgent, EmailAgent, PDFAgent
+    import resources
+
+    load_dotenv()
+    model = resources.get_model()
+
+    scores = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            content = f.read()
+
+        results = {}
+        for compress in (False, True):
+            classifier = ClassifierAgent(model, compress=compress)
+            format_type = classifier.classify_format(content, path)["format"]
+            agent = PDFAgent(model, compress=compress) if format_type == "PDF" else EmailAgent(model, compress=compress)
+            extracted = agent.process_pdf(content) if format_type == "PDF" else agent.process_email(content)
+            text = agent._pdf_to_text(content) if format_type == "PDF" else content
+            results[compress] = (classifier._detect_intent(text, format_type), extracted.get("entities"))
+
+        (plain_intent, plain_entities), (intent, entities) = results[False], results[True]
+        score = agreement(plain_entities, entities)
+        scores.append(score)
+        print(f"{path}: intent {'match' if intent == plain_intent else f'{plain_intent} -> {intent}'}, "
+              f"entity agreement {score:.0%}")
+
+    for kind, stats in STATS.summary().items():
+        print(f"{kind}: {stats['original_chars']} -> {stats['compressed_chars']} chars ({stats['ratio']:.1f}x)")
+    print(f"Mean entity agreement: {sum(scores) / len(scores):.0%}")
+
+
+if __name__ == "__main__":
+    main()
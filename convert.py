@@ -0,0 +1,40 @@
+"""Parsing of the loosely typed values the agents extract, shared by export and analytics"""
+import re
+from datetime import datetime
+
+_DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y"]
+_NUMBER_RE = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+_ORDINAL_RE = re.compile(r'(\d)(st|nd|rd|th)\b')
+
+
+def to_float(value):
+    """Parse an amount like 157000, "157,000.00" or "$157,000" """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _NUMBER_RE.search(str(value))
+    return float(match.group().replace(",", "")) if match else None
+
+
+def to_int(value):
+    """Parse a quantity like 25, "500 units" or ["500 units"]"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if value is None:
+        return None
+    amount = to_float(value)
+    return int(amount) if amount is not None else None
+
+
+def to_date(value):
+    """Parse a date in one of the common formats produced by the agents"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if not isinstance(value, str):
+        return None
+    value = _ORDINAL_RE.sub(r'\1', value.strip())
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
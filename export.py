@@ -0,0 +1,233 @@
+"""Bulk export of stored documents to Parquet or CSV
+
+Walks Redis with SCAN and pipelined HGETALL in batches, flattens the extracted
+entities into typed columns by intent, and writes them in row groups so memory
+stays bounded by --row-group-size:
+
+    python export.py --output docs.parquet
+    python export.py --output docs-nightly.csv --state-file export_state.json
+
+With --state-file, each run only exports documents stored since the previous
+run's watermark and advances it on success.
+"""
+import argparse
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+
+from convert import to_date, to_float, to_int
+from memory import TIMESTAMP_FORMAT, RedisMemory
+
+# Documents stamped this recently may still be committing, so they are left for the next run
+SETTLE_SECONDS = 5
+
+# Output columns and their types
+COLUMNS = [
+    ("doc_id", "string"),
+    ("parent_id", "string"),
+    ("source", "string"),
+    ("format", "string"),
+    ("intent", "string"),
+    ("timestamp", "timestamp"),
+    ("sender", "string"),
+    ("urgency", "string"),
+    ("invoice_number", "string"),
+    ("vendor_name", "string"),
+    ("client_name", "string"),
+    ("total_amount", "float"),
+    ("issue_date", "date"),
+    ("due_date", "date"),
+    ("payment_terms", "string"),
+    ("line_item_count", "int"),
+    ("product", "string"),
+    ("quantity", "int"),
+    ("deadline", "date"),
+    ("budget_range", "string"),
+    ("sender_name", "string"),
+    ("sender_company", "string"),
+    ("issue_description", "string"),
+    ("requested_action", "string"),
+    ("message_count", "int"),
+    ("anomaly_count", "int"),
+    ("extra", "string"),
+]
+
+# Entity keys that feed each column, per intent; the first key present wins
+_EMAIL_FIELDS = {
+    "sender_name": ["sender_name"],
+    "sender_company": ["sender_company"],
+    "product": ["product_name", "product"],
+    "quantity": ["quantity", "quantities"],
+    "issue_description": ["issue_description"],
+    "requested_action": ["requested_action"],
+    "deadline": ["deadline", "dates"],
+}
+INTENT_FIELDS = {
+    "Invoice": {
+        "invoice_number": ["invoice_number"],
+        "vendor_name": ["vendor_name", "vendor"],
+        "client_name": ["client_name", "client"],
+        "total_amount": ["total_amount", "total"],
+        "issue_date": ["issue_date", "date"],
+        "due_date": ["due_date"],
+        "payment_terms": ["payment_terms"],
+    },
+    "RFQ": {
+        "product": ["product", "product_name"],
+        "quantity": ["quantity", "quantities"],
+        "deadline": ["deadline"],
+        "budget_range": ["budget_range"],
+    },
+    "Complaint": _EMAIL_FIELDS,
+}
+
+
+def to_timestamp(value):
+    try:
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+_CONVERTERS = {
+    "string": lambda v: v if v is None or isinstance(v, str) else json.dumps(v),
+    "float": to_float,
+    "int": to_int,
+    "date": to_date,
+    "timestamp": to_timestamp,
+}
+
+
+def flatten_document(doc_id, document):
+    """Flatten a stored document into one typed row"""
+    extracted = document.get("extracted_data")
+    if not isinstance(extracted, dict):
+        extracted = {}
+    intent = document.get("intent")
+
+    # JSON agent results keep their values in "fields", email/PDF ones in "entities"
+    entities = extracted.get("fields") or extracted.get("entities") or {}
+    if not isinstance(entities, dict):
+        entities = {}
+
+    row = {
+        "doc_id": doc_id,
+        "parent_id": document.get("parent_id"),
+        "source": document.get("source"),
+        "format": document.get("format"),
+        "intent": intent,
+        "timestamp": document.get("timestamp"),
+        "sender": extracted.get("sender"),
+        "urgency": extracted.get("urgency"),
+        "message_count": extracted.get("message_count"),
+        "anomaly_count": len(extracted["anomalies"]) if isinstance(extracted.get("anomalies"), list) else None,
+        "line_item_count": len(entities["line_items"]) if isinstance(entities.get("line_items"), list) else None,
+    }
+
+    used = {"line_items"}
+    for column, keys in INTENT_FIELDS.get(intent, _EMAIL_FIELDS).items():
+        for key in keys:
+            if entities.get(key) is not None:
+                row[column] = entities[key]
+                used.add(key)
+                break
+
+    extra = {k: v for k, v in entities.items() if k not in used}
+    row["extra"] = json.dumps(extra) if extra else None
+
+    return {column: _CONVERTERS[column_type](row.get(column)) for column, column_type in COLUMNS}
+
+
+class CSVExportWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=[column for column, _ in COLUMNS])
+        self.writer.writeheader()
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    def __init__(self, path):
+        # pyarrow ships with streamlit; only imported for Parquet exports
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            "string": pa.string(),
+            "float": pa.float64(),
+            "int": pa.int64(),
+            "date": pa.date32(),
+            "timestamp": pa.timestamp("s"),
+        }
+        self.pa = pa
+        self.schema = pa.schema([(column, types[column_type]) for column, column_type in COLUMNS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows):
+        # Each call becomes one row group
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_documents(memory, writer, batch_size=500, row_group_size=10000, since=None, until=None):
+    """Stream documents from memory into writer; returns the number of rows written"""
+    rows = []
+    total = 0
+    for batch in memory.scan_documents(batch_size=batch_size, since=since, until=until):
+        rows.extend(flatten_document(doc_id, document) for doc_id, document in batch)
+        if len(rows) >= row_group_size:
+            writer.write_rows(rows)
+            total += len(rows)
+            rows = []
+
+    if rows:
+        writer.write_rows(rows)
+        total += len(rows)
+
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export stored documents to Parquet or CSV")
+    parser.add_argument("--output", required=True, help="Output file (.parquet or .csv)")
+    parser.add_argument("--format", choices=["parquet", "csv"], help="Defaults to the output file extension")
+    parser.add_argument("--redis-url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--batch-size", type=int, default=500, help="Keys per SCAN/HGETALL batch")
+    parser.add_argument("--row-group-size", type=int, default=10000, help="Rows buffered per write")
+    parser.add_argument("--since", help="Only export documents stored at or after this UTC time (YYYY-MM-DD HH:MM:SS)")
+    parser.add_argument("--state-file", help="Watermark file for incremental exports")
+    args = parser.parse_args()
+
+    export_format = args.format or ("csv" if args.output.endswith(".csv") else "parquet")
+
+    since = args.since
+    if since is None and args.state_file and os.path.exists(args.state_file):
+        with open(args.state_file) as f:
+            since = json.load(f)["watermark"]
+    memory = RedisMemory.from_url(args.redis_url)
+    # Documents are stamped with the Redis server clock in UTC, so the watermark is too;
+    # documents stored during the export are left for the next run
+    until = (memory.server_time() - timedelta(seconds=SETTLE_SECONDS)).strftime(TIMESTAMP_FORMAT)
+    writer = CSVExportWriter(args.output) if export_format == "csv" else ParquetExportWriter(args.output)
+    try:
+        total = export_documents(memory, writer, args.batch_size, args.row_group_size, since, until)
+    finally:
+        writer.close()
+
+    if args.state_file:
+        with open(args.state_file, "w") as f:
+            json.dump({"watermark": until}, f)
+
+    print(f"Exported {total} documents to {args.output}" + (f" (since {since})" if since else ""))
+
+
+if __name__ == "__main__":
+    main()
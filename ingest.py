@@ -0,0 +1,143 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _env_bytes(name, default_mb):
+    """A size limit in MB from the environment, read at call time so .env files loaded later apply"""
+    return int(float(os.environ.get(name, default_mb)) * 1024 * 1024)
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the per-file or per-session size limit"""
+
+
+class SessionQuota:
+    """Total bytes a session may upload; re-ingesting the same content is free
+
+    Uploads are also remembered by name and size, so a rerun of an already
+    counted file passes the up-front check made before its hash is known.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or _env_bytes("MAX_SESSION_UPLOAD_MB", 200)
+        self.uploads = {}
+        self.names = set()
+
+    @property
+    def used(self):
+        return sum(self.uploads.values())
+
+    def check(self, size, content_hash=None, name=None):
+        """Raise UploadTooLargeError if `size` more bytes would exceed the quota"""
+        if content_hash in self.uploads or (name, size) in self.names:
+            return
+        if self.used + size > self.max_bytes:
+            raise UploadTooLargeError(
+                f"Session upload limit of {self.max_bytes / (1024 * 1024):g} MB reached"
+            )
+
+    def record(self, content_hash, size, name=None):
+        self.uploads[content_hash] = size
+        self.names.add((name, size))
+
+
+class IngestedUpload:
+    """An upload held in memory or, beyond the spool threshold, in a temporary file
+
+    `content` is a bytes-like view for the agents: the bytes themselves for
+    small uploads, a read-only memory map of the spool file for large ones.
+    """
+
+    def __init__(self, name, size, sha256, data=None, spool_file=None):
+        self.name = name
+        self.size = size
+        self.sha256 = sha256
+        self.spooled = spool_file is not None
+        self._data = data
+        self._spool_file = spool_file
+        self._mmap = None
+
+    @property
+    def content(self):
+        if not self.spooled:
+            return self._data
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self._spool_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def close(self):
+        """Release the memory map and delete the spool file"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._spool_file is not None:
+            self._spool_file.close()
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def ingest_upload(source, name, declared_size=None, quota=None, max_file_bytes=None,
+                  spool_threshold=None, chunk_size=CHUNK_SIZE):
+    """Copy a file-like upload in chunks, spooling to disk past the threshold and hashing on the way
+
+    Size limits are enforced before any parsing or LLM work: up front from the
+    declared size when it is known, and again while copying.
+    """
+    # Limits can be tuned per deployment through the environment
+    if max_file_bytes is None:
+        max_file_bytes = _env_bytes("MAX_UPLOAD_MB", 50)
+    if spool_threshold is None:
+        spool_threshold = _env_bytes("SPOOL_THRESHOLD_MB", 5)
+
+    if declared_size is not None:
+        _check_file_size(declared_size, max_file_bytes)
+        if quota is not None:
+            quota.check(declared_size, name=name)
+
+    buffer = io.BytesIO()
+    spool_file = None
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            _check_file_size(size, max_file_bytes)
+            digest.update(chunk)
+            if spool_file is None and size > spool_threshold:
+                # Move what we have so far to disk and keep writing there
+                spool_file = tempfile.TemporaryFile()
+                spool_file.write(buffer.getbuffer())
+                buffer = None
+            (spool_file or buffer).write(chunk)
+
+        content_hash = digest.hexdigest()
+        if quota is not None:
+            quota.check(size, content_hash)
+            quota.record(content_hash, size, name)
+    except Exception:
+        if spool_file is not None:
+            spool_file.close()
+        raise
+
+    if spool_file is not None:
+        spool_file.flush()
+        return IngestedUpload(name, size, content_hash, spool_file=spool_file)
+    return IngestedUpload(name, size, content_hash, data=buffer.getvalue())
+
+
+def _check_file_size(size, max_file_bytes):
+    if size > max_file_bytes:
+        raise UploadTooLargeError(f"File exceeds the {max_file_bytes / (1024 * 1024):g} MB upload limit")
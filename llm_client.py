@@ -0,0 +1,374 @@
+import json
+import random
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the model could not produce a response within its retry budget"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without calling the model while the circuit breaker is open"""
+
+
+# Status codes and exception names that mean the upstream is throttling or unhealthy
+_THROTTLED_CODES = {429}
+_UNAVAILABLE_CODES = {500, 502, 503, 504}
+_THROTTLED_NAMES = {"ResourceExhausted", "TooManyRequests"}
+_UNAVAILABLE_NAMES = {"ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "BadGateway", "GatewayTimeout"}
+
+
+def classify_error(error):
+    """Classify a model error as "throttled", "unavailable", or None if retrying will not help"""
+    if isinstance(error, FutureTimeoutError):
+        return "unavailable"
+
+    code = getattr(error, "code", None)
+    name = type(error).__name__
+    if code in _THROTTLED_CODES or name in _THROTTLED_NAMES:
+        return "throttled"
+    if code in _UNAVAILABLE_CODES or name in _UNAVAILABLE_NAMES:
+        return "unavailable"
+    return None
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on the number of in-flight model calls
+
+    The limit grows by roughly one per window of successful calls and is cut
+    by `decrease_ratio` whenever the upstream throttles or times out.
+    """
+
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=32, decrease_ratio=0.5):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_ratio = decrease_ratio
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Wait for a free slot; returns False if none became free within the timeout"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        """Free a slot once the underlying call has actually finished"""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def on_success(self):
+        """Additive increase"""
+        with self.condition:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify()
+
+    def on_throttle(self):
+        """Multiplicative decrease"""
+        with self.condition:
+            self.limit = max(self.min_limit, self.limit * self.decrease_ratio)
+
+
+class CircuitBreaker:
+    """Fail fast while the upstream is unhealthy
+
+    Opens after `failure_threshold` consecutive failures. After `reset_timeout`
+    seconds a single trial call is let through (half-open); its outcome closes
+    the circuit again or re-opens it. A trial that says nothing about upstream
+    health re-opens it without restarting the timeout, so the next call is the
+    new trial.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may be made now"""
+        with self.lock:
+            if self.state == "open":
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Model circuit is open; upstream is unhealthy")
+                self.state = "half_open"
+            elif self.state == "half_open":
+                # A trial call is already in progress
+                raise CircuitOpenError("Model circuit is half-open; waiting on trial call")
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = self.clock()
+
+    def record_ignored(self):
+        """Release a half-open trial whose outcome says nothing about upstream health"""
+        with self.lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+
+class ResilientModel:
+    """Drop-in wrapper around a model's generate_content for shared use by all agents
+
+    Each attempt runs under a deadline. Throttling (429), 5xx responses and
+    timeouts are retried with jittered exponential backoff, shrink the adaptive
+    concurrency limit and count towards the circuit breaker. Once retries are
+    exhausted, or while the circuit is open, LLMUnavailableError is raised so
+    agents can use their local fallbacks.
+    """
+
+    def __init__(self, model, timeout=30, max_retries=3, base_delay=0.5, max_delay=10,
+                 limiter=None, breaker=None):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        # Timed-out calls keep their thread until they return, so allow headroom
+        self.executor = ThreadPoolExecutor(max_workers=self.limiter.max_limit * 2)
+
+    def generate_content(self, prompt, **kwargs):
+        """Call the wrapped model, retrying transient upstream failures"""
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+
+            if not self.limiter.acquire(timeout=self.timeout):
+                # Slots are held by calls that have not returned, so the upstream is hanging
+                self.breaker.record_failure()
+                raise LLMUnavailableError("Timed out waiting for a model concurrency slot")
+
+            future = self.executor.submit(self.model.generate_content, prompt, **kwargs)
+            future.add_done_callback(lambda f: self.limiter.release())
+            try:
+                response = future.result(timeout=self.timeout)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind is None:
+                    self.breaker.record_ignored()
+                    raise
+                if kind == "throttled" or isinstance(e, FutureTimeoutError):
+                    self.limiter.on_throttle()
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise LLMUnavailableError(f"Model call failed after {attempt + 1} attempts: {e!r}") from e
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self.limiter.on_success()
+            self.breaker.record_success()
+            return response
+
+    def stats(self):
+        """Current concurrency limit and breaker state"""
+        return {
+            "limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "circuit": self.breaker.state
+        }
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff delay"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class InvalidModelOutputError(Exception):
+    """Raised when no tier of a cascade produced usable output"""
+
+
+# A model in a cascade; cost is per 1000 tokens, attempts are re-asks on unparseable JSON
+ModelTier = namedtuple("ModelTier", ["name", "model", "cost_per_1k_tokens", "attempts"], defaults=[0.0, 1])
+
+
+def parse_json_response(text):
+    """Parse a JSON object from a model response, allowing markdown code fences"""
+    text = text.strip()
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+    return json.loads(text)
+
+
+class ModelCascade:
+    """Ordered tiers of models, cheapest first, escalating only when the output is not good enough
+
+    A tier's answer is escalated to the next tier if it is not valid JSON, lacks
+    required fields, reports a confidence below `min_confidence`, or fails the
+    caller's validation. Plain generate_content calls go to the first tier, so a
+    cascade can be used wherever a single model is expected.
+    """
+
+    def __init__(self, tiers, min_confidence=0.7, clock=time.perf_counter):
+        self.tiers = list(tiers)
+        self.min_confidence = min_confidence
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.tier_stats = {
+            tier.name: {"calls": 0, "accepted": 0, "escalated": 0, "rejected": 0, "latency": 0.0, "tokens": 0,
+                        "cost": 0.0, "reasons": Counter()}
+            for tier in self.tiers
+        }
+
+    def generate_content(self, prompt, **kwargs):
+        """Call the first tier"""
+        return self._call(self.tiers[0], prompt, **kwargs)
+
+    def generate_json(self, prompt, required=(), validate=None):
+        """Return the first tier's JSON answer that passes every check
+
+        `validate` takes the parsed answer and returns a list of problems. If
+        every tier is exhausted the last parseable answer is returned; if there
+        is none, InvalidModelOutputError (or LLMUnavailableError when no tier
+        could be reached) is raised.
+        """
+        best = None
+        unavailable = None
+        for index, tier in enumerate(self.tiers):
+            final = index == len(self.tiers) - 1
+            tier_prompt = prompt
+            for _ in range(tier.attempts):
+                try:
+                    response = self._call(tier, tier_prompt)
+                except LLMUnavailableError as e:
+                    unavailable = e
+                    reason = "unavailable"
+                    break
+                try:
+                    data = parse_json_response(response.text)
+                except json.JSONDecodeError:
+                    reason = "invalid_json"
+                    tier_prompt = prompt + "\n\nIMPORTANT: Return ONLY a valid JSON object with no additional text."
+                    continue
+
+                reason = self._check(data, required, validate)
+                if isinstance(data, dict):
+                    best = data
+                break
+
+            if reason is None:
+                self._record(tier, "accepted")
+                return best
+            self._record(tier, "rejected" if final else "escalated", reason)
+
+        if best is not None:
+            return best
+        if unavailable is not None and reason == "unavailable":
+            raise unavailable
+        raise InvalidModelOutputError(f"No model tier produced usable output ({reason})")
+
+    def stats(self):
+        """First tier health, plus latency, cost and escalation rate per tier"""
+        first = self.tiers[0].model
+        summary = dict(first.stats()) if hasattr(first, "stats") else {}
+        with self.lock:
+            summary["tiers"] = {
+                name: {
+                    "calls": s["calls"],
+                    "accepted": s["accepted"],
+                    "escalation_rate": s["escalated"] / answered if answered else 0.0,
+                    "rejected": s["rejected"],
+                    "avg_latency": s["latency"] / s["calls"] if s["calls"] else 0.0,
+                    "tokens": s["tokens"],
+                    "cost": s["cost"],
+                    "reasons": dict(s["reasons"])
+                }
+                for name, s in self.tier_stats.items()
+                for answered in [s["accepted"] + s["escalated"] + s["rejected"]]
+            }
+        return summary
+
+    def _call(self, tier, prompt, **kwargs):
+        """Call a tier's model, recording its latency and cost"""
+        start = self.clock()
+        try:
+            response = tier.model.generate_content(prompt, **kwargs)
+        finally:
+            elapsed = self.clock() - start
+            with self.lock:
+                self.tier_stats[tier.name]["calls"] += 1
+                self.tier_stats[tier.name]["latency"] += elapsed
+
+        tokens = _token_count(prompt, response)
+        with self.lock:
+            self.tier_stats[tier.name]["tokens"] += tokens
+            self.tier_stats[tier.name]["cost"] += tokens / 1000 * tier.cost_per_1k_tokens
+        return response
+
+    def _check(self, data, required, validate):
+        """The reason to escalate an answer, or None if it is good enough"""
+        if not isinstance(data, dict):
+            return "invalid_json"
+        if any(data.get(field) is None for field in required):
+            return "missing_fields"
+        confidence = data.get("confidence")
+        if isinstance(confidence, (int, float)) and confidence < self.min_confidence:
+            return "low_confidence"
+        if validate is not None and validate(data):
+            return "validation"
+        return None
+
+    def _record(self, tier, outcome, reason=None):
+        with self.lock:
+            self.tier_stats[tier.name][outcome] += 1
+            if reason is not None:
+                self.tier_stats[tier.name]["reasons"][reason] += 1
+
+
+def _token_count(prompt, response):
+    """Tokens used by a call, from the response metadata or estimated at 4 characters each"""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    if total:
+        return total
+    return (len(prompt) + len(getattr(response, "text", "") or "")) // 4
+
+
+FakeResponse = namedtuple("FakeResponse", ["text"])
+
+
+class FakeModel:
+    """Local stand-in for a generative model, for tests and load tests
+
+    `responses` is a string returned for every prompt, a list returned in turn
+    (the last one repeating), or a function of the prompt. `latency` seconds are
+    slept per call to mimic the upstream.
+    """
+
+    def __init__(self, responses="{}", latency=0.0):
+        self.responses = responses
+        self.latency = latency
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self.lock:
+            index = len(self.prompts)
+            self.prompts.append(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if callable(self.responses):
+            return FakeResponse(self.responses(prompt))
+        if isinstance(self.responses, list):
+            return FakeResponse(self.responses[min(index, len(self.responses) - 1)])
+        return FakeResponse(self.responses)
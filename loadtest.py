@@ -0,0 +1,147 @@
+"""Load test for the HTTP ingestion API
+
+Starts the API locally against the fake model and measures throughput,
+latency and how many submissions were refused with 429:
+
+    python loadtest.py --spawn --requests 500 --concurrency 32
+    python loadtest.py --url http://api.internal:8000 --batch-size 10
+
+Run it with increasing --concurrency to find the point where one replica
+starts returning 429s; divide the expected peak load by that throughput to
+size the number of replicas.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def multipart_body(field, files):
+    """Encode (name, bytes) files as multipart/form-data under one field name"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, content in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{name}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def submit(url, files, timeout):
+    """POST one document or a batch; returns (status, seconds, documents processed)"""
+    batch = len(files) > 1
+    body, content_type = multipart_body("files" if batch else "file", files)
+    request = urllib.request.Request(
+        f"{url}/documents/batch" if batch else f"{url}/documents",
+        data=body,
+        headers={"Content-Type": content_type},
+        method="POST"
+    )
+
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            lines = response.read().decode().splitlines() if batch else [None]
+            status = response.status
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - start, 0
+    except OSError:
+        return "error", time.perf_counter() - start, 0
+
+    processed = sum(1 for line in lines if line is None or "error" not in json.loads(line))
+    return status, time.perf_counter() - start, processed
+
+
+def spawn_server(port, fake_latency):
+    """Start the API with the fake model and in-memory storage, waiting until it answers"""
+    env = dict(os.environ, FAKE_MODEL="1", FAKE_MODEL_LATENCY=str(fake_latency))
+    env.setdefault("REDIS_URL", "redis://localhost:1/0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("API did not start within 30 seconds")
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the document ingestion API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="Start a local API with the fake model")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn")
+    parser.add_argument("--fake-latency", type=float, default=0.2, help="Fake model seconds per call, for --spawn")
+    parser.add_argument("--files", nargs="+", help="Documents to send (default: sample_inputs)")
+    parser.add_argument("--requests", type=int, default=200, help="Requests to send")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--batch-size", type=int, default=1, help="Documents per request; above 1 uses /documents/batch")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    paths = args.files or sorted(glob.glob(os.path.join(os.path.dirname(__file__), "sample_inputs", "*")))
+    documents = []
+    for path in paths:
+        with open(path, "rb") as f:
+            documents.append((os.path.basename(path), f.read()))
+
+    server = None
+    url = args.url.rstrip("/")
+    if args.spawn:
+        server = spawn_server(args.port, args.fake_latency)
+        url = f"http://127.0.0.1:{args.port}"
+
+    def request(i):
+        files = [documents[(i * args.batch_size + j) % len(documents)] for j in range(args.batch_size)]
+        return submit(url, files, args.timeout)
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(request, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        with urllib.request.urlopen(f"{url}/metrics", timeout=10) as response:
+            server_metrics = json.load(response)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    statuses = Counter(status for status, _, _ in results)
+    latencies = sorted(seconds for status, seconds, _ in results if status == 200)
+    processed = sum(count for _, _, count in results)
+
+    print(f"{args.requests} requests of {args.batch_size} document(s), concurrency {args.concurrency}, {elapsed:.1f}s")
+    print(f"Status codes: {dict(statuses)}")
+    print(f"Throughput: {processed / elapsed:.1f} documents/s")
+    print(f"Latency (200s): p50 {percentile(latencies, 0.5):.3f}s, p95 {percentile(latencies, 0.95):.3f}s, "
+          f"p99 {percentile(latencies, 0.99):.3f}s")
+    print(f"Refused with 429: {statuses.get(429, 0) / len(results):.1%}")
+    print(f"Server: {server_metrics['completed']} completed, {server_metrics['rejected']} rejected, "
+          f"model limit {server_metrics['model'].get('limit')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
+import time
+
+# Measured first so cold-start time includes the imports below
+script_start = time.perf_counter()
+
 import streamlit as st
-import google.generativeai as genai
-import json
-import os
+import queue
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import time
+from dotenv import load_dotenv
 
-# Import our custom modules
-from agents import ClassifierAgent, JSONAgent, EmailAgent, PDFAgent
+# Import our custom modules; heavy dependencies load lazily in resources
+import compress
+import render
+import resources
+from ingest import SessionQuota, UploadTooLargeError, ingest_upload
 from memory import RedisMemory
 
+load_dotenv()
+
 # Configure the page
 st.set_page_config(
     page_title="Document Processing",
@@ -203,61 +212,24 @@ st.markdown('''
 # Initialize session state
 if "conversation_id" not in st.session_state:
     st.session_state.conversation_id = str(uuid.uuid4())
+if "last_document_id" not in st.session_state:
+    st.session_state.last_document_id = None
 if "processing_history" not in st.session_state:
     st.session_state.processing_history = []
-if "selected_history_item" not in st.session_state:
-    st.session_state.selected_history_item = None
-
-# Set your Gemini API key
-api_key = "******************************"  # Replace with your actual key
-genai.configure(api_key=api_key)
+if "queued_jobs" not in st.session_state:
+    st.session_state.queued_jobs = {}
+if "upload_quota" not in st.session_state:
+    st.session_state.upload_quota = SessionQuota()
 
-# Load the Gemini model
-model = genai.GenerativeModel(model_name="gemini-1.5-flash")
+# Shared per process: created on the first run, reused by every session and rerun
+model = resources.get_model()
+memory = resources.get_memory()
+document_pipeline = resources.get_pipeline()
+redis_available = isinstance(memory, RedisMemory)
+setup_time = time.perf_counter() - script_start
 
-# Initialize agents
-classifier_agent = ClassifierAgent(model)
-json_agent = JSONAgent(model)
-email_agent = EmailAgent(model)
-pdf_agent = PDFAgent(model)
-
-# Initialize Redis memory with proper error handling
-try:
-    memory = RedisMemory(host='localhost', port=6379, db=0)
-    redis_available = True
-except Exception as e:
-    redis_available = False
-    # Fallback to in-memory storage
-    class InMemoryStorage:
-        def __init__(self):
-            self.storage = {}
-            
-        def store_document_data(self, conversation_id, source, format_type, intent, extracted_data):
-            self.storage[f"doc:{conversation_id}"] = {
-                "source": source,
-                "format": format_type,
-                "intent": intent,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "extracted_data": extracted_data
-            }
-            
-        def get_document_data(self, conversation_id):
-            return self.storage.get(f"doc:{conversation_id}")
-            
-        def list_all_documents(self):
-            return list(self.storage.keys())
-            
-    memory = InMemoryStorage()
-
-# Format JSON with syntax highlighting
-def format_json(json_data):
-    if isinstance(json_data, str):
-        try:
-            json_data = json.loads(json_data)
-        except:
-            return f"<pre>{json_data}</pre>"
-    
-    return f"<pre>{json.dumps(json_data, indent=2)}</pre>"
+# Counts the result/history deltas sent to the browser on this rerun
+renderer = render.Renderer()
 
 # Sidebar with system status
 with st.sidebar:
@@ -272,9 +244,30 @@ with st.sidebar:
             st.markdown("<div class='badge badge-green'>Redis Connected</div>", unsafe_allow_html=True)
         else:
             st.markdown("<div class='badge badge-amber'>In-Memory Storage</div>", unsafe_allow_html=True)
+    
+    # Upstream model health
+    model_stats = model.stats()
+    circuit_color = "badge-green" if model_stats['circuit'] == "closed" else "badge-amber"
+    st.markdown(f"<div class='badge {circuit_color}'>Gemini: {model_stats['circuit']} · limit {model_stats['limit']}</div>", unsafe_allow_html=True)
+    
+    # Per-tier cascade stats: escalations to stronger models and what they cost
+    for tier_name, tier in model_stats['tiers'].items():
+        st.markdown(f"<div class='badge badge-blue'>{tier_name}: {tier['calls']} calls · {tier['avg_latency']:.1f}s · escalated {tier['escalation_rate']:.0%} · ${tier['cost']:.4f}</div>", unsafe_allow_html=True)
+    
+    # Queue mode hands uploads to worker processes (python worker.py)
+    use_queue = redis_available and st.toggle("Process via worker queue", value=False)
+    if use_queue:
+        from work_queue import DocumentQueue
+        document_queue = DocumentQueue(memory.redis_client)
+        
+        # Backlog per priority; p95 wait is measured from upload to worker pickup
+        st.markdown("<h3>Queue</h3>", unsafe_allow_html=True)
+        for priority, stats in document_queue.metrics().items():
+            sla_color = "badge-green" if stats['p95_wait'] <= stats['sla_seconds'] else "badge-amber"
+            st.markdown(f"<div class='badge {sla_color}'>{priority}: {stats['depth']} queued · p95 wait {stats['p95_wait']:.1f}s</div>", unsafe_allow_html=True)
 
 # Main content with tabs
-tabs = st.tabs(["📄 Upload", "📋 History", "🧠 Memory"])
+tabs = st.tabs(["📄 Upload", "📋 History", "🧠 Memory", "📈 Analytics"])
 
 # Upload Tab
 with tabs[0]:
@@ -297,6 +290,18 @@ with tabs[0]:
     
     # Process the uploaded file
     if uploaded_file is not None:
+        # Spool the upload and enforce size limits before any parsing or LLM work
+        try:
+            upload = ingest_upload(
+                uploaded_file,
+                uploaded_file.name,
+                declared_size=uploaded_file.size,
+                quota=st.session_state.upload_quota
+            )
+        except UploadTooLargeError as e:
+            st.error(str(e))
+            st.stop()
+        
         # File info
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("<h2>File Information</h2>", unsafe_allow_html=True)
@@ -308,125 +313,120 @@ with tabs[0]:
         with col2:
             file_size = round(uploaded_file.size / 1024, 2) if hasattr(uploaded_file, 'size') else "Unknown"
             st.markdown(f"<p><strong>Size:</strong> {file_size} KB</p>", unsafe_allow_html=True)
+            st.markdown(f"<p><strong>SHA-256:</strong> {upload.sha256[:16]}...</p>", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
         
         # Processing pipeline
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("<h2>Processing Pipeline</h2>", unsafe_allow_html=True)
         
-        # Read file content
-        file_content = uploaded_file.read()
+        # Small uploads are bytes, large ones a memory map of the spool file
+        file_content = upload.content
+        # One stored document per distinct upload; reruns overwrite it without being counted again
+        document_id = f"{st.session_state.conversation_id}:{upload.sha256[:16]}"
+        st.session_state.last_document_id = document_id
         
-        # Step 1: Classify document
-        with st.spinner():
+        if use_queue:
+            # Hand the document to the worker processes and wait for completion
+            with st.spinner():
+                st.markdown("<div class='step'>", unsafe_allow_html=True)
+                st.markdown("<div class='step-header'><div class='step-number'>1</div> <strong>Queued for Worker Processing</strong></div>", unsafe_allow_html=True)
+                
+                # Reruns must not enqueue the same upload again
+                file_key = upload.sha256
+                if file_key not in st.session_state.queued_jobs:
+                    st.session_state.queued_jobs[file_key] = document_queue.enqueue(
+                        uploaded_file.name,
+                        file_content,
+                        conversation_id=document_id
+                    )
+                job_id = st.session_state.queued_jobs[file_key]
+                st.markdown(f"<div class='badge badge-blue'>Job: {job_id[:8]}...</div>", unsafe_allow_html=True)
+                
+                job = document_queue.wait_for_job(job_id)
+                st.markdown("</div>", unsafe_allow_html=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+            
+            if job is None or job["status"] == "dead":
+                upload.close()
+            if job is None:
+                st.warning("The document is still queued. Make sure a worker is running (python worker.py) and refresh to check again.")
+                st.stop()
+            if job["status"] == "dead":
+                st.error(f"Processing failed: {job.get('error', 'Unknown error')}")
+                st.stop()
+            
+            classification = job["classification"]
+            result = job["result"]
+        else:
+            # Mailbox progress is reported from pipeline threads; only this script
+            # thread may update the page, so the counts are passed back through a queue
+            message_status = st.empty()
+            message_counts = queue.Queue()
+            
+            # Intent detection and entity extraction run concurrently
+            with st.spinner("Processing document..."), ThreadPoolExecutor(max_workers=1) as runner:
+                future = runner.submit(document_pipeline.process, document_id, file_content, uploaded_file.name,
+                                       on_message=message_counts.put)
+                while not future.done() or not message_counts.empty():
+                    try:
+                        count = message_counts.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    message_status.markdown(f"<div class='badge badge-blue'>Messages processed: {count}</div>", unsafe_allow_html=True)
+                output = future.result()
+            classification = output["classification"]
+            result = output["result"]
+            timings = output["timings"]
+            
+            # Step 1: Classify document
             st.markdown("<div class='step'>", unsafe_allow_html=True)
             st.markdown("<div class='step-header'><div class='step-number'>1</div> <strong>Document Classification</strong></div>", unsafe_allow_html=True)
-            progress_bar = st.progress(0)
-            for i in range(100):
-                progress_bar.progress(i + 1)
-                time.sleep(0.01)
-            classification = classifier_agent.classify_document(file_content, uploaded_file.name)
-            col1, col2 = st.columns(2)
+            col1, col2, col3 = st.columns(3)
             with col1:
                 st.markdown(f"<div class='badge badge-blue'>Format: {classification['format']}</div>", unsafe_allow_html=True)
             with col2:
                 st.markdown(f"<div class='badge badge-blue'>Intent: {classification['intent']}</div>", unsafe_allow_html=True)
+            with col3:
+                st.markdown(f"<div class='badge badge-blue'>{timings['intent']:.2f}s</div>", unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Step 2: Process with appropriate agent
-        with st.spinner():
+            
+            # Step 2: Process with appropriate agent
             st.markdown("<div class='step'>", unsafe_allow_html=True)
             st.markdown("<div class='step-header'><div class='step-number'>2</div> <strong>Specialized Agent Processing</strong></div>", unsafe_allow_html=True)
-            progress_bar = st.progress(0)
-            for i in range(100):
-                progress_bar.progress(i + 1)
-                time.sleep(0.01)
-            
-            agent_name = "JSON Agent" if classification['format'] == "JSON" else "PDF Agent" if classification['format'] == "PDF" else "Email Agent"
-            st.markdown(f"<div class='badge badge-blue'>Agent: {agent_name}</div>", unsafe_allow_html=True)
-            
-            if classification['format'] == "JSON":
-                result = json_agent.process_json(file_content)
-            elif classification['format'] == "PDF":
-                result = pdf_agent.process_pdf(file_content)
-            else:  # Email or Text
-                result = email_agent.process_email(file_content)
+            col1, col2 = st.columns(2)
+            with col1:
+                agent_name = document_pipeline.agent_name(classification)
+                st.markdown(f"<div class='badge badge-blue'>Agent: {agent_name}</div>", unsafe_allow_html=True)
+            with col2:
+                st.markdown(f"<div class='badge badge-blue'>{timings['extract']:.2f}s (concurrent with classification)</div>", unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Step 3: Store in memory
-        with st.spinner():
+            
+            # Step 3: Store in memory
             st.markdown("<div class='step'>", unsafe_allow_html=True)
             st.markdown("<div class='step-header'><div class='step-number'>3</div> <strong>Memory Storage</strong></div>", unsafe_allow_html=True)
-            progress_bar = st.progress(0)
-            for i in range(100):
-                progress_bar.progress(i + 1)
-                time.sleep(0.005)
-            
-            memory.store_document_data(
-                st.session_state.conversation_id,
-                uploaded_file.name,
-                classification['format'],
-                classification['intent'],
-                result
-            )
-            
             storage_type = "Redis Database" if redis_available else "In-Memory Storage"
             st.markdown(f"<div class='badge badge-blue'>Storage: {storage_type}</div>", unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-        
-        # Display results
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("<h2>Processing Results</h2>", unsafe_allow_html=True)
-        
-        # Format the result based on document type
-        if classification['format'] == "JSON" and "fields" in result:
-            # For RFQ or structured data
-            for key, value in result.get("fields", {}).items():
-                st.markdown(f"<div style='display:flex; margin-bottom:8px;'><div style='min-width:120px; font-weight:500;'>{key}:</div> <div>{value}</div></div>", unsafe_allow_html=True)
-            
-            if "anomalies" in result and result["anomalies"]:
-                st.markdown("<h3>Anomalies</h3>", unsafe_allow_html=True)
-                for anomaly in result["anomalies"]:
-                    st.markdown(f"<p>• {anomaly}</p>", unsafe_allow_html=True)
-        
-        elif classification['format'] in ["Email", "PDF"] and "entities" in result:
-            # For Email or PDF
-            col1, col2 = st.columns(2)
-            with col1:
-                sender = result.get('sender', 'Unknown')
-                st.markdown(f"<div style='display:flex; margin-bottom:8px;'><div style='min-width:120px; font-weight:500;'>Sender:</div> <div>{sender}</div></div>", unsafe_allow_html=True)
-            with col2:
-                urgency = result.get('urgency', 'MEDIUM')
-                urgency_color = "#ef4444" if urgency == "HIGH" else "#f59e0b" if urgency == "MEDIUM" else "#10b981"
-                st.markdown(f"<div style='display:flex; margin-bottom:8px;'><div style='min-width:120px; font-weight:500;'>Urgency:</div> <div style='color:{urgency_color};'>{urgency}</div></div>", unsafe_allow_html=True)
-            
-            st.markdown("<h3>Extracted Entities</h3>", unsafe_allow_html=True)
-            
-            # Check if entities contains an error message
-            if isinstance(result.get("entities"), dict) and "error" in result.get("entities", {}):
-                st.markdown("<div class='json-viewer'>", unsafe_allow_html=True)
-                st.markdown(format_json(result), unsafe_allow_html=True)
-                st.markdown("</div>", unsafe_allow_html=True)
-            else:
-                for key, value in result.get("entities", {}).items():
-                    st.markdown(f"<div style='display:flex; margin-bottom:8px;'><div style='min-width:120px; font-weight:500;'>{key}:</div> <div>{value}</div></div>", unsafe_allow_html=True)
-        
-        else:
-            # Generic JSON display for any other format
-            st.markdown("<div class='json-viewer'>", unsafe_allow_html=True)
-            st.markdown(format_json(result), unsafe_allow_html=True)
             st.markdown("</div>", unsafe_allow_html=True)
         
-        st.markdown("</div>", unsafe_allow_html=True)
+        # Display results as one HTML block, with a table for each list of records
+        results_html, result_tables = render.result_view(classification, result)
+        renderer.html(st, results_html)
+        for title, rows in result_tables:
+            renderer.html(st, render.table_title(title))
+            renderer.table(st, rows)
         
         # Add to processing history
         st.session_state.processing_history.append({
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "file": uploaded_file.name,
+            "file": upload.name,
             "classification": classification,
             "result": result
         })
+        
+        # Drop the memory map and spool file; results no longer reference them
+        upload.close()
 
 # History tab
 with tabs[1]:
@@ -439,73 +439,38 @@ with tabs[1]:
     else:
         # Two-column layout for history
         col1, col2 = st.columns([1, 2])
+        history = st.session_state.processing_history
         
         with col1:
             st.markdown("<h2>Document List</h2>", unsafe_allow_html=True)
             
-            # Display history items as clickable cards
-            for idx, entry in enumerate(reversed(st.session_state.processing_history)):
-                # Create a unique key for this history item
-                item_key = f"{entry['timestamp']}-{entry['file']}"
-                
-                # Check if this item is selected
-                is_selected = st.session_state.selected_history_item == item_key
-                item_class = "history-item active" if is_selected else "history-item"
-                
-                st.markdown(f"<div class='{item_class}'>", unsafe_allow_html=True)
-                st.markdown(f"<p style='color:#94a3b8; font-size:0.8rem;'>{entry['timestamp']}</p>", unsafe_allow_html=True)
-                st.markdown(f"<p style='font-weight:500;'>{entry['file']}</p>", unsafe_allow_html=True)
-                st.markdown(f"<div style='display:flex; gap:8px; margin-top:5px;'>", unsafe_allow_html=True)
-                st.markdown(f"<span class='status status-info' style='font-size:0.7rem;'>{entry['classification']['format']}</span>", unsafe_allow_html=True)
-                st.markdown(f"<span class='status status-info' style='font-size:0.7rem;'>{entry['classification']['intent']}</span>", unsafe_allow_html=True)
-                st.markdown("</div>", unsafe_allow_html=True)
-                st.markdown("</div>", unsafe_allow_html=True)
-                
-                # Add a button to select this history item (hidden from UI but used for state management)
-                if st.button(f"Select {idx}", key=f"select_{idx}"):
-                    st.session_state.selected_history_item = item_key
-                    st.experimental_rerun()
+            # Most recent first; a single widget selects the entry to show
+            selected_index = st.selectbox(
+                "Select document",
+                options=list(reversed(range(len(history)))),
+                format_func=lambda i: f"{history[i]['file']} · {history[i]['timestamp']}",
+                key="history_selection"
+            )
+            renderer.html(st, render.history_list(history, selected_index))
         
         with col2:
-            # Display selected history item details or prompt to select an item
-            if st.session_state.selected_history_item is None and len(st.session_state.processing_history) > 0:
-                # Auto-select the most recent item
-                st.session_state.selected_history_item = f"{st.session_state.processing_history[-1]['timestamp']}-{st.session_state.processing_history[-1]['file']}"
-                st.experimental_rerun()
+            selected_entry = history[selected_index]
+            renderer.html(st, render.history_detail(selected_entry))
             
-            if st.session_state.selected_history_item is not None:
-                # Find the selected history item
-                selected_entry = None
-                for entry in st.session_state.processing_history:
-                    if f"{entry['timestamp']}-{entry['file']}" == st.session_state.selected_history_item:
-                        selected_entry = entry
-                        break
-                
-                if selected_entry:
-                    st.markdown("<div class='container'>", unsafe_allow_html=True)
-                    st.markdown(f"<h2>{selected_entry['file']}</h2>", unsafe_allow_html=True)
-                    
-                    # Document details
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.markdown(f"<p><strong>Format:</strong> {selected_entry['classification']['format']}</p>", unsafe_allow_html=True)
-                    with col2:
-                        st.markdown(f"<p><strong>Intent:</strong> {selected_entry['classification']['intent']}</p>", unsafe_allow_html=True)
-                    with col3:
-                        st.markdown(f"<p><strong>Time:</strong> {selected_entry['timestamp']}</p>", unsafe_allow_html=True)
-                    
-                    st.markdown("<hr style='margin:15px 0; border:none; border-top:1px solid #2d3748;'>", unsafe_allow_html=True)
-                    
-                    # Processing result
-                    st.markdown("<h3>Processing Result</h3>", unsafe_allow_html=True)
-                    st.markdown("<div class='json-viewer'>", unsafe_allow_html=True)
-                    st.markdown(format_json(selected_entry['result']), unsafe_allow_html=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
-            else:
-                st.markdown("<div class='container'>", unsafe_allow_html=True)
-                st.info("Select a document from the list to view details")
-                st.markdown("</div>", unsafe_allow_html=True)
+            # Processing result
+            results_html, result_tables = render.result_view(
+                selected_entry['classification'],
+                selected_entry['result'],
+                title="Processing Result"
+            )
+            renderer.html(st, results_html)
+            for title, rows in result_tables:
+                renderer.html(st, render.table_title(title))
+                renderer.table(st, rows)
+            
+            # The raw JSON is only sent to the browser when asked for
+            if st.toggle("Show raw JSON", key="history_raw_json"):
+                renderer.html(st, render.json_block(selected_entry['result']))
 
 # Memory inspection tab
 with tabs[2]:
@@ -515,15 +480,61 @@ with tabs[2]:
     st.markdown("<div class='container'>", unsafe_allow_html=True)
     st.markdown("<h2>Current Memory Data</h2>", unsafe_allow_html=True)
     
-    data = memory.get_document_data(st.session_state.conversation_id)
+    data = memory.get_document_data(st.session_state.last_document_id) if st.session_state.last_document_id else None
     if data:
-        st.markdown("<div class='json-viewer'>", unsafe_allow_html=True)
-        st.markdown(format_json(data), unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        renderer.html(st, render.json_block(data))
     else:
         st.info("No data found for current conversation. Process a document to store data in memory.")
     st.markdown("</div>", unsafe_allow_html=True)
 
+# Analytics tab
+with tabs[3]:
+    st.markdown("<h1>📈 Analytics</h1>", unsafe_allow_html=True)
+    
+    # Counters are maintained on every write, so this reads one bucket per hour
+    hours = st.selectbox("Window", options=[24, 72, 168], format_func=lambda h: f"Last {h} hours", key="analytics_window")
+    stats = memory.get_analytics(hours)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Documents", stats['docs'])
+    col2.metric("Unique senders", stats['unique_senders'])
+    col3.metric("Invoice total", f"{stats['invoice_total']:,.2f}", help=f"{stats['invoices']} invoices")
+    col4.metric("Anomaly rate", f"{stats['anomaly_rate']:.1%}")
+    
+    st.markdown("<h3>Documents per hour</h3>", unsafe_allow_html=True)
+    st.bar_chart({"documents": list(stats['docs_per_hour'].values())})
+    
+    col1, col2, col3 = st.columns(3)
+    for column, title, counts in [(col1, "Intent", stats['intents']),
+                                  (col2, "Format", stats['formats']),
+                                  (col3, "Urgency", stats['urgencies'])]:
+        with column:
+            renderer.html(st, render.table_title(title))
+            renderer.table(st, [{title: name, "Documents": count} for name, count in sorted(counts.items(), key=lambda item: -item[1])])
+    
+    # Top lists are all-time, like the unique sender count below
+    col1, col2 = st.columns(2)
+    with col1:
+        renderer.html(st, render.table_title("Top senders"))
+        renderer.table(st, [{"Sender": name, "Documents": count} for name, count in stats['top_senders']])
+    with col2:
+        renderer.html(st, render.table_title("Top vendors"))
+        renderer.table(st, [{"Vendor": name, "Documents": count} for name, count in stats['top_vendors']])
+    st.caption(f"Unique senders all time: {stats['unique_senders_all_time']}")
+
+# Setup vs. interaction latency for this rerun; resources are only built on a cold start
+with st.sidebar:
+    # Prompt size saved by stripping quoted history, signatures and page furniture
+    for kind, stats in compress.STATS.summary().items():
+        st.markdown(f"<div class='badge badge-green'>{kind} prompts: {stats['ratio']:.1f}x smaller</div>", unsafe_allow_html=True)
+    
+    st.markdown("<h3>Timings</h3>", unsafe_allow_html=True)
+    cold_start = sum(resources.TIMINGS.values())
+    st.markdown(f"<div class='badge badge-blue'>Cold start: {cold_start * 1000:.0f} ms</div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='badge badge-blue'>Rerun setup: {setup_time * 1000:.0f} ms</div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='badge badge-blue'>Rerun total: {(time.perf_counter() - script_start) * 1000:.0f} ms</div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='badge badge-blue'>Result deltas: {renderer.deltas}</div>", unsafe_allow_html=True)
+
 # Custom footer
 st.markdown("<div style='margin-top:30px; text-align:center; color:#94a3b8; font-size:0.8rem;'>Multi-Agent Document Processing System v1.2.0</div>", unsafe_allow_html=True)
 
@@ -1,23 +1,68 @@
-import redis
 import json
-from datetime import datetime
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import analytics
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 class RedisMemory:
-    def __init__(self, host='localhost', port=6379, db=0):
-        self.redis_client = redis.Redis(host=host, port=port, db=db)
+    def __init__(self, host='localhost', port=6379, db=0, client=None):
+        if client is None:
+            # Imported lazily so sessions using in-memory storage never load redis
+            import redis
+            client = redis.Redis(host=host, port=port, db=db)
+        self.redis_client = client
+    
+    @classmethod
+    def from_url(cls, url):
+        """Create a RedisMemory from a redis:// URL"""
+        import redis
+        return cls(client=redis.Redis.from_url(url))
+
+    def server_time(self):
+        """Current UTC time of the Redis server, the single clock for document timestamps"""
+        return _utc_from_redis_time(self.redis_client.time())
+        
+    def store_document_data(self, conversation_id, source, format_type, intent, extracted_data,
+                            parent_id=None, position=0):
+        """Store document processing data in Redis
         
-    def store_document_data(self, conversation_id, source, format_type, intent, extracted_data):
-        """Store document processing data in Redis"""
+        Documents split out of a container (e.g. a mailbox) pass the parent's
+        conversation id and their position so they can be listed later. The
+        analytics counters are updated in the same MULTI/EXEC transaction, the
+        first time the document is stored only.
+
+        The timestamp is UTC from the Redis server clock, the same clock as
+        export watermarks, so host clock skew cannot hide documents from them.
+        """
+        now = datetime.now()
         data = {
             "source": source,
             "format": format_type,
             "intent": intent,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "extracted_data": json.dumps(extracted_data)
         }
+        if parent_id is not None:
+            data["parent_id"] = parent_id
         
         key = f"doc:{conversation_id}"
-        self.redis_client.hmset(key, {k: json.dumps(v) if isinstance(v, dict) else v for k, v in data.items()})
+        facts = analytics.document_facts(format_type, intent, extracted_data)
+
+        def store(pipe):
+            # Reruns and redeliveries overwrite the document but are only counted once;
+            # the transaction retries if another writer stores the key after this check
+            is_new = not pipe.exists(key)
+            data["timestamp"] = _utc_from_redis_time(pipe.time()).strftime(TIMESTAMP_FORMAT)
+            pipe.multi()
+            pipe.hmset(key, {k: json.dumps(v) if isinstance(v, dict) else v for k, v in data.items()})
+            if parent_id is not None:
+                pipe.zadd(f"doc_children:{parent_id}", {conversation_id: position})
+            if is_new:
+                analytics.record_document(pipe, facts, now)
+
+        self.redis_client.transaction(store, key)
         
     def get_document_data(self, conversation_id):
         """Retrieve document data from Redis"""
@@ -27,6 +72,65 @@ class RedisMemory:
         if not data:
             return None
             
+        return self._decode_document(data)
+    
+    def get_child_documents(self, parent_id):
+        """Retrieve the documents split out of a container, in order"""
+        child_ids = self.redis_client.zrange(f"doc_children:{parent_id}", 0, -1)
+        child_ids = [c.decode('utf-8') if isinstance(c, bytes) else c for c in child_ids]
+        
+        pipe = self.redis_client.pipeline()
+        for child_id in child_ids:
+            pipe.hgetall(f"doc:{child_id}")
+        
+        return [
+            dict(self._decode_document(data), id=child_id)
+            for child_id, data in zip(child_ids, pipe.execute())
+            if data
+        ]
+    
+    def scan_documents(self, batch_size=500, since=None, until=None):
+        """Walk all stored documents with SCAN, yielding batches of (conversation_id, document)
+        
+        since/until bound the document timestamp to [since, until) so incremental
+        exports only fetch documents stored after a watermark.
+        """
+        keys = []
+        for key in self.redis_client.scan_iter(match="doc:*", count=batch_size):
+            keys.append(key.decode('utf-8') if isinstance(key, bytes) else key)
+            if len(keys) >= batch_size:
+                yield self._fetch_batch(keys, since, until)
+                keys = []
+        if keys:
+            yield self._fetch_batch(keys, since, until)
+    
+    def _fetch_batch(self, keys, since, until):
+        """Pipelined HGETALL for a batch of keys within the timestamp bounds"""
+        if since is not None or until is not None:
+            # Check timestamps first so unchanged documents are not transferred
+            pipe = self.redis_client.pipeline()
+            for key in keys:
+                pipe.hget(key, "timestamp")
+            timestamps = [t.decode('utf-8') if isinstance(t, bytes) else t for t in pipe.execute()]
+            keys = [
+                key for key, timestamp in zip(keys, timestamps)
+                if timestamp is not None
+                and (since is None or timestamp >= since)
+                and (until is None or timestamp < until)
+            ]
+        
+        pipe = self.redis_client.pipeline()
+        for key in keys:
+            pipe.hgetall(key)
+        
+        return [
+            (key[len("doc:"):], self._decode_document(data))
+            for key, data in zip(keys, pipe.execute())
+            if data
+        ]
+    
+    def _decode_document(self, data):
+        """Convert a raw Redis hash into a document dict"""
         # Convert bytes to strings and parse JSON fields
         result = {}
         for k, v in data.items():
@@ -44,7 +148,100 @@ class RedisMemory:
                 
         return result
         
+    def get_analytics(self, hours=24):
+        """Aggregates over the last `hours` hourly buckets"""
+        return analytics.read_dashboard(self.redis_client, hours)
+        
     def list_all_documents(self):
         """List all document keys in Redis"""
         keys = self.redis_client.keys("doc:*")
-        return [key.decode('utf-8') if isinstance(key, bytes) else key for key in keys]
\ No newline at end of file
+        return [key.decode('utf-8') if isinstance(key, bytes) else key for key in keys]
+
+
+def _utc_from_redis_time(reply):
+    """Naive UTC datetime from a Redis TIME reply of (seconds, microseconds)"""
+    seconds, microseconds = reply
+    return datetime.fromtimestamp(int(seconds) + int(microseconds) / 1e6, timezone.utc).replace(tzinfo=None)
+
+
+class InMemoryStorage:
+    """Process-local fallback with the same interface as RedisMemory"""
+    
+    def __init__(self):
+        self.storage = {}
+        self.children = {}
+        # Analytics counters per hourly bucket, mirroring the Redis keys
+        self.hourly = defaultdict(Counter)
+        self.hourly_senders = defaultdict(set)
+        self.senders = set()
+        self.top_senders = Counter()
+        self.top_vendors = Counter()
+        # Shared by all sessions of the process
+        self.lock = threading.Lock()
+        
+    def store_document_data(self, conversation_id, source, format_type, intent, extracted_data,
+                            parent_id=None, position=0):
+        now = datetime.now()
+        data = {
+            "source": source,
+            "format": format_type,
+            "intent": intent,
+            "timestamp": datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT),
+            "extracted_data": extracted_data
+        }
+        facts = analytics.document_facts(format_type, intent, extracted_data)
+        with self.lock:
+            if parent_id is not None:
+                data["parent_id"] = parent_id
+                self.children.setdefault(parent_id, {})[conversation_id] = position
+            key = f"doc:{conversation_id}"
+            is_new = key not in self.storage
+            self.storage[key] = data
+            if is_new:
+                self._record_document(facts, analytics.hour_bucket(now))
+    
+    def _record_document(self, facts, bucket):
+        """Same counters as analytics.record_document"""
+        counters = self.hourly[bucket]
+        counters["docs"] += 1
+        for dimension in ("format", "intent", "urgency"):
+            if facts[dimension]:
+                counters[f"{dimension}:{facts[dimension]}"] += 1
+        if facts["has_anomalies"]:
+            counters["anomalies"] += 1
+        if facts["invoice_total"] is not None:
+            counters["invoices"] += 1
+            counters["invoice_total"] += facts["invoice_total"]
+        
+        if facts["sender"] and facts["sender"] != "Unknown":
+            self.hourly_senders[bucket].add(facts["sender"])
+            self.senders.add(facts["sender"])
+            self.top_senders[facts["sender"]] += 1
+        if facts["vendor"]:
+            self.top_vendors[facts["vendor"]] += 1
+        
+    def get_document_data(self, conversation_id):
+        return self.storage.get(f"doc:{conversation_id}")
+        
+    def get_child_documents(self, parent_id):
+        with self.lock:
+            children = dict(self.children.get(parent_id, {}))
+        return [
+            dict(self.storage[f"doc:{child_id}"], id=child_id)
+            for child_id in sorted(children, key=children.get)
+        ]
+        
+    def get_analytics(self, hours=24):
+        buckets = analytics.recent_buckets(hours)
+        with self.lock:
+            return analytics.summarize(
+                buckets,
+                [dict(self.hourly.get(bucket, {})) for bucket in buckets],
+                len(set().union(*(self.hourly_senders.get(bucket, set()) for bucket in buckets))),
+                len(self.senders),
+                self.top_senders.most_common(analytics.TOP_N),
+                self.top_vendors.most_common(analytics.TOP_N)
+            )
+        
+    def list_all_documents(self):
+        return list(self.storage.keys())
\ No newline at end of file
@@ -0,0 +1,151 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# A pipeline stage; `func` receives a dict with the results of `depends_on`
+Stage = namedtuple("Stage", ["name", "func", "depends_on"], defaults=[()])
+
+
+def run_stages(stages, executor):
+    """Run each stage as soon as its dependencies have finished
+
+    Independent stages run concurrently on the executor. Returns the result and
+    duration in seconds of every stage, keyed by stage name.
+    """
+    results = {}
+    timings = {}
+    pending = {stage.name: stage for stage in stages}
+    running = {}
+
+    while pending or running:
+        for name, stage in list(pending.items()):
+            if all(dependency in results for dependency in stage.depends_on):
+                inputs = {dependency: results[dependency] for dependency in stage.depends_on}
+                running[executor.submit(_timed, stage.func, inputs)] = name
+                del pending[name]
+
+        if not running:
+            raise ValueError(f"Stages with unsatisfiable dependencies: {sorted(pending)}")
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            results[name], timings[name] = future.result()
+
+    return results, timings
+
+
+def _timed(func, inputs):
+    """Call a stage function and measure how long it took"""
+    start = time.perf_counter()
+    result = func(inputs)
+    return result, time.perf_counter() - start
+
+
+class DocumentPipeline:
+    """Run a document through classification, the specialized agents and memory storage
+
+    Format detection is local and instant, and extraction only depends on the
+    format, so the LLM intent detection and entity extraction run concurrently:
+
+        format ──> intent  ──┐
+               └─> extract ──┴─> store
+    """
+
+    def __init__(self, classifier_agent, json_agent, email_agent, pdf_agent, memory,
+                 mailbox_workers=8, executor=None):
+        self.classifier_agent = classifier_agent
+        self.json_agent = json_agent
+        self.email_agent = email_agent
+        self.pdf_agent = pdf_agent
+        self.memory = memory
+        self.mailbox_workers = mailbox_workers
+        self.executor = executor or ThreadPoolExecutor(max_workers=8)
+
+    def process(self, conversation_id, file_content, file_name, on_message=None):
+        """Classify, extract and store a document
+
+        For a mailbox, `on_message` is called with the number of messages
+        processed so far after each one; it runs on a pipeline thread.
+        """
+        stages = [
+            Stage("format", lambda r: self.classifier_agent.classify_format(file_content, file_name)),
+            Stage("intent", lambda r: self._detect_intent(file_content, r["format"]), ["format"]),
+            Stage("extract", lambda r: self.extract(conversation_id, file_content, file_name, r["format"], on_message), ["format"]),
+            Stage("store", lambda r: self.store(conversation_id, file_name, r["intent"], r["extract"]), ["intent", "extract"]),
+        ]
+        results, timings = run_stages(stages, self.executor)
+
+        return {
+            "classification": results["intent"],
+            "result": results["extract"],
+            "timings": timings
+        }
+
+    def agent_name(self, classification):
+        """Name of the agent that handles a classified document"""
+        if classification['format'] == "JSON":
+            return "JSON Agent"
+        elif classification['format'] == "PDF":
+            return "PDF Agent"
+        return "Email Agent"
+
+    def extract(self, conversation_id, file_content, file_name, classification, on_message=None):
+        """Process the document with the agent matching its format"""
+        if classification['intent'] == "Mailbox":
+            return self._extract_mailbox(conversation_id, file_content, file_name, on_message)
+        elif classification['format'] == "JSON":
+            return self.json_agent.process_json(file_content)
+        elif classification['format'] == "PDF":
+            return self.pdf_agent.process_pdf(file_content)
+        else:  # Email or Text
+            return self.email_agent.process_email(file_content)
+
+    def store(self, conversation_id, file_name, classification, result):
+        """Persist the processed document"""
+        self.memory.store_document_data(
+            conversation_id,
+            file_name,
+            classification['format'],
+            classification['intent'],
+            result
+        )
+
+    def _detect_intent(self, file_content, classification):
+        """Complete the local format classification with the LLM intent"""
+        if classification['intent'] is not None:
+            return classification
+
+        return {
+            "format": classification['format'],
+            "intent": self.classifier_agent._detect_intent(file_content, classification['format'])
+        }
+
+    def _extract_mailbox(self, conversation_id, file_content, file_name, on_message=None):
+        """Classify and extract each message concurrently, storing them as they complete"""
+        messages = []
+        for message in self.email_agent.process_messages(file_content, self.classifier_agent,
+                                                         max_workers=self.mailbox_workers):
+            message_id = f"{conversation_id}:msg:{message['index']}"
+            self.memory.store_document_data(
+                message_id,
+                file_name,
+                message['classification']['format'],
+                message['classification']['intent'],
+                message['result'],
+                parent_id=conversation_id,
+                position=message['index']
+            )
+            messages.append({
+                "id": message_id,
+                "sender": message['result'].get('sender'),
+                "urgency": message['result'].get('urgency'),
+                "intent": message['classification']['intent']
+            })
+            if on_message is not None:
+                on_message(len(messages))
+
+        return {
+            "message_count": len(messages),
+            "messages": messages
+        }
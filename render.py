@@ -0,0 +1,159 @@
+"""Consolidated HTML rendering of processing results
+
+Every Streamlit element is a separate delta sent to the browser, so results are
+rendered as one HTML block each. Lists of records (line items, mailbox
+messages) go into a single dataframe, which scrolls virtually, and large nested
+values are collapsed and truncated.
+"""
+import html
+import json
+
+# Nested values longer than this are truncated inside their collapsed block
+MAX_NESTED_CHARS = 5000
+
+# Lists of records with at least this many rows are shown as a table
+MIN_TABLE_ROWS = 2
+
+URGENCY_COLORS = {"HIGH": "#ef4444", "MEDIUM": "#f59e0b"}
+
+_ROW = "<div style='display:flex; margin-bottom:8px;'><div style='min-width:120px; font-weight:500;'>{key}:</div> <div>{value}</div></div>"
+
+
+class Renderer:
+    """Send HTML blocks and tables to Streamlit containers, counting the deltas"""
+
+    def __init__(self):
+        self.deltas = 0
+
+    def html(self, container, markup):
+        container.markdown(markup, unsafe_allow_html=True)
+        self.deltas += 1
+
+    def table(self, container, rows):
+        container.dataframe(rows, use_container_width=True, hide_index=True)
+        self.deltas += 1
+
+
+def urgency_color(urgency):
+    return URGENCY_COLORS.get(urgency, "#10b981")
+
+
+def table_title(title):
+    return f"<h3>{html.escape(str(title))}</h3>"
+
+
+def json_block(data, max_chars=None):
+    """A JSON viewer block, truncated to max_chars if given"""
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError:
+            pass
+    text = data if isinstance(data, str) else json.dumps(data, indent=2)
+    if max_chars is not None and len(text) > max_chars:
+        text = text[:max_chars] + f"\n… {len(text) - max_chars} more characters"
+
+    return f"<div class='json-viewer'><pre>{html.escape(text)}</pre></div>"
+
+
+def value_html(value):
+    """Inline HTML for a field value; nested values are collapsed"""
+    if isinstance(value, (dict, list)):
+        count = len(value)
+        label = f"{count} {'fields' if isinstance(value, dict) else 'items'}"
+        return f"<details><summary>{label}</summary>{json_block(value, MAX_NESTED_CHARS)}</details>"
+    return html.escape(str(value))
+
+
+def fields_html(fields):
+    """One row per field"""
+    return "".join(_ROW.format(key=html.escape(str(key)), value=value_html(value)) for key, value in fields.items())
+
+
+def split_tables(fields):
+    """Separate lists of records from the other fields"""
+    tables = {}
+    other = {}
+    for key, value in fields.items():
+        if (isinstance(value, list) and len(value) >= MIN_TABLE_ROWS
+                and all(isinstance(item, dict) for item in value)):
+            tables[key] = value
+        else:
+            other[key] = value
+
+    return other, tables
+
+
+def result_view(classification, result, title="Processing Results"):
+    """HTML for a processing result, and the (title, rows) tables to show after it"""
+    parts = [f"<div class='card'><h2>{title}</h2>"]
+    tables = []
+
+    if classification['format'] == "JSON" and "fields" in result:
+        # For RFQ or structured data
+        fields, field_tables = split_tables(result.get("fields", {}))
+        parts.append(fields_html(fields))
+        tables.extend(field_tables.items())
+
+        if result.get("anomalies"):
+            parts.append("<h3>Anomalies</h3>")
+            parts.extend(f"<p>• {html.escape(str(anomaly))}</p>" for anomaly in result["anomalies"])
+
+    elif classification['intent'] == "Mailbox":
+        # Messages go into a table below
+        parts.append(f"<p><strong>Messages:</strong> {result['message_count']}</p>")
+        tables.append(("Messages", result["messages"]))
+
+    elif classification['format'] in ["Email", "PDF"] and "entities" in result:
+        # For Email or PDF
+        urgency = result.get('urgency', 'MEDIUM')
+        parts.append("<div style='display:flex; gap:48px;'>")
+        parts.append(_ROW.format(key="Sender", value=html.escape(str(result.get('sender', 'Unknown')))))
+        parts.append(_ROW.format(key="Urgency", value=f"<span style='color:{urgency_color(urgency)};'>{urgency}</span>"))
+        parts.append("</div><h3>Extracted Entities</h3>")
+
+        entities = result.get("entities")
+        if isinstance(entities, dict) and "error" not in entities:
+            fields, field_tables = split_tables(entities)
+            parts.append(fields_html(fields))
+            tables.extend(field_tables.items())
+        else:
+            parts.append(json_block(result, MAX_NESTED_CHARS))
+
+    else:
+        # Generic JSON display for any other format
+        parts.append(json_block(result, MAX_NESTED_CHARS))
+
+    parts.append("</div>")
+    return "".join(parts), tables
+
+
+def history_list(entries, selected_index):
+    """HTML for the history cards, most recent first"""
+    parts = []
+    for index in reversed(range(len(entries))):
+        entry = entries[index]
+        item_class = "history-item active" if index == selected_index else "history-item"
+        parts.append(
+            f"<div class='{item_class}'>"
+            f"<p style='color:#94a3b8; font-size:0.8rem;'>{entry['timestamp']}</p>"
+            f"<p style='font-weight:500;'>{html.escape(entry['file'])}</p>"
+            f"<div style='display:flex; gap:8px; margin-top:5px;'>"
+            f"<span class='status status-info' style='font-size:0.7rem;'>{html.escape(str(entry['classification']['format']))}</span>"
+            f"<span class='status status-info' style='font-size:0.7rem;'>{html.escape(str(entry['classification']['intent']))}</span>"
+            f"</div></div>"
+        )
+
+    return "".join(parts)
+
+
+def history_detail(entry):
+    """HTML header for a selected history entry"""
+    return (
+        f"<div class='container'><h2>{html.escape(entry['file'])}</h2>"
+        f"<div style='display:flex; gap:48px;'>"
+        f"<p><strong>Format:</strong> {html.escape(str(entry['classification']['format']))}</p>"
+        f"<p><strong>Intent:</strong> {html.escape(str(entry['classification']['intent']))}</p>"
+        f"<p><strong>Time:</strong> {entry['timestamp']}</p>"
+        f"</div><hr style='margin:15px 0; border:none; border-top:1px solid #2d3748;'></div>"
+    )
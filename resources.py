@@ -0,0 +1,124 @@
+"""Process-wide resources shared by every session
+
+The model, agents, storage backend and pipeline are created once per process on
+first use and reused by all Streamlit sessions and reruns. Heavy dependencies
+(google.generativeai, redis) are only imported when their resource is first
+requested. Creation times are kept in TIMINGS so setup cost can be told apart
+from interaction latency.
+"""
+import os
+import threading
+import time
+
+# Seconds spent creating each resource, recorded once per process
+TIMINGS = {}
+
+_resources = {}
+_lock = threading.RLock()
+
+
+def _get(name, factory):
+    """Return a shared resource, creating it on first use"""
+    if name in _resources:
+        return _resources[name]
+
+    with _lock:
+        if name not in _resources:
+            start = time.perf_counter()
+            nested_before = sum(TIMINGS.values())
+            _resources[name] = factory()
+            # Exclude resources created inside the factory so TIMINGS sums to the total
+            nested = sum(TIMINGS.values()) - nested_before
+            TIMINGS[name] = time.perf_counter() - start - nested
+
+    return _resources[name]
+
+
+def get_model():
+    """Shared model cascade, each tier behind the deadline/backoff/circuit-breaker wrapper
+
+    GEMINI_MODELS lists the tiers cheapest first, each optionally with its cost
+    per 1000 tokens, e.g. "gemini-1.5-flash:0.0003,gemini-1.5-pro:0.005".
+    Without it a single GEMINI_MODEL tier is used. FAKE_MODEL=1 replaces Gemini
+    with a local fake answering after FAKE_MODEL_LATENCY seconds, for load tests.
+    """
+    def create():
+        from llm_client import FakeModel, ModelCascade, ModelTier, ResilientModel
+
+        if os.environ.get("FAKE_MODEL") == "1":
+            fake = FakeModel(_fake_answer, latency=float(os.environ.get("FAKE_MODEL_LATENCY", 0.2)))
+            return ModelCascade([ModelTier("fake", ResilientModel(fake))])
+
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+        specs = os.environ.get("GEMINI_MODELS") or os.environ.get("GEMINI_MODEL", "gemini-1.5-flash")
+
+        tiers = []
+        for spec in [s.strip() for s in specs.split(",") if s.strip()]:
+            name, _, cost = spec.partition(":")
+            tiers.append(ModelTier(name, ResilientModel(genai.GenerativeModel(model_name=name)), float(cost or 0)))
+        # The strongest tier gets the re-asks on unparseable JSON; a single model keeps all three
+        tiers[-1] = tiers[-1]._replace(attempts=3 if len(tiers) == 1 else 2)
+
+        return ModelCascade(tiers, min_confidence=float(os.environ.get("CASCADE_MIN_CONFIDENCE", 0.7)))
+
+    return _get("model", create)
+
+
+def _fake_answer(prompt):
+    """Fake model answers: an intent for intent prompts, an empty extraction otherwise"""
+    if "Return only the intent" in prompt:
+        return "Unknown"
+    return '{"confidence": 0.9}'
+
+
+def get_agents():
+    """Shared agents, keyed by role"""
+    def create():
+        from agents import ClassifierAgent, JSONAgent, EmailAgent, PDFAgent
+
+        model = get_model()
+        compress = os.environ.get("PROMPT_COMPRESSION", "1") != "0"
+        return {
+            "classifier": ClassifierAgent(model, compress=compress),
+            "json": JSONAgent(model),
+            "email": EmailAgent(model, compress=compress),
+            "pdf": PDFAgent(model, compress=compress)
+        }
+
+    return _get("agents", create)
+
+
+def get_memory():
+    """Shared storage backend: Redis if reachable, otherwise in-memory storage"""
+    def create():
+        from memory import RedisMemory, InMemoryStorage
+
+        try:
+            memory = RedisMemory.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+            memory.redis_client.ping()
+            return memory
+        except Exception:
+            return InMemoryStorage()
+
+    return _get("memory", create)
+
+
+def get_pipeline(concurrency=None):
+    """Shared document pipeline
+
+    `concurrency` is the number of documents processed at once, e.g. the API
+    worker count. Each document runs up to two stages at a time, so the stage
+    executor is sized to match; the first caller decides.
+    """
+    def create():
+        from concurrent.futures import ThreadPoolExecutor
+        from pipeline import DocumentPipeline
+
+        agents = get_agents()
+        executor = ThreadPoolExecutor(max_workers=2 * concurrency) if concurrency else None
+        return DocumentPipeline(agents["classifier"], agents["json"], agents["email"], agents["pdf"], get_memory(),
+                                executor=executor)
+
+    return _get("pipeline", create)
@@ -0,0 +1,144 @@
+import math
+import re
+import threading
+from datetime import date
+
+from agents import as_text, determine_urgency
+
+PRIORITIES = ("HIGH", "MEDIUM", "LOW")
+
+# Default share of dispatches per priority level when every queue is busy
+DEFAULT_WEIGHTS = {"HIGH": 6, "MEDIUM": 3, "LOW": 1}
+
+# Target time from ingest to dispatch, in seconds
+DEFAULT_SLA_SECONDS = {"HIGH": 60, "MEDIUM": 600, "LOW": 3600}
+
+# Only the start of a document is inspected so priority stays cheap to compute
+PRIORITY_SCAN_CHARS = 4000
+
+# Keywords hinting at the document intent and how they move the priority score
+_INTENT_HINTS = [
+    (re.compile(r'\b(complaint|defective|broken|refund|overheating|not working|outage|failure)\b', re.IGNORECASE), 1),
+    (re.compile(r'\b(overdue|past due|final notice)\b', re.IGNORECASE), 1),
+    (re.compile(r'\b(newsletter|unsubscribe|no action required)\b', re.IGNORECASE), -1),
+]
+
+_ISO_DATE_RE = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+_MONTH_DATE_RE = re.compile(
+    r'\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+    r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b\.?\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b',
+    re.IGNORECASE
+)
+_RELATIVE_DEADLINE_RE = re.compile(r'\b(today|tomorrow|eod|end of day)\b', re.IGNORECASE)
+# Sent and received dates say nothing about deadlines
+_DATE_HEADER_RE = re.compile(r'^(Date|Sent|Received):.*$', re.IGNORECASE | re.MULTILINE)
+_MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+
+def compute_priority(file_content, file_name, today=None):
+    """Compute a cheap scheduling priority (HIGH, MEDIUM or LOW) at ingest time
+
+    Combines the keyword urgency used by the email agent with intent hints and
+    the proximity of the nearest deadline. No LLM calls are made.
+    """
+    if file_name.endswith('.pdf'):
+        # Binary content; matches the default urgency of the PDF agent
+        return "MEDIUM"
+
+    text = as_text(file_content, limit=PRIORITY_SCAN_CHARS)[:PRIORITY_SCAN_CHARS]
+
+    score = {"HIGH": 2, "MEDIUM": 1, "LOW": 0}[determine_urgency(text)]
+    for pattern, points in _INTENT_HINTS:
+        if pattern.search(text):
+            score += points
+
+    days = _days_to_deadline(text, today or date.today())
+    if days is not None:
+        if days <= 1:
+            score += 2
+        elif days <= 3:
+            score += 1
+
+    if score >= 3:
+        return "HIGH"
+    elif score >= 1:
+        return "MEDIUM"
+    return "LOW"
+
+
+def _days_to_deadline(text, today):
+    """Days until the nearest date mentioned in the text, ignoring long-past dates"""
+    text = _DATE_HEADER_RE.sub('', text)
+    if _RELATIVE_DEADLINE_RE.search(text):
+        return 0
+
+    dates = []
+    for year, month, day in _ISO_DATE_RE.findall(text):
+        dates.append(_safe_date(int(year), int(month), int(day)))
+    for month, day, year in _MONTH_DATE_RE.findall(text):
+        dates.append(_safe_date(int(year) if year else today.year, _MONTHS.index(month[:3].lower()) + 1, int(day)))
+
+    # Deadlines that passed within the last week are overdue, not irrelevant
+    days = [(d - today).days for d in dates if d is not None and (d - today).days >= -7]
+    return min(days) if days else None
+
+
+def _safe_date(year, month, day):
+    """Build a date, returning None for impossible dates"""
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+class WeightedAgingPolicy:
+    """Choose which priority queue to serve next
+
+    Non-empty queues are served by smooth weighted round-robin, so HIGH gets
+    most dispatches without starving the others. The oldest item of a queue is
+    promoted one level for every `aging_seconds` it has waited, and its queue
+    is then served with the weight of the promoted level.
+    """
+
+    def __init__(self, weights=None, aging_seconds=300):
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.aging_seconds = aging_seconds
+        self.current = {priority: 0 for priority in PRIORITIES}
+        self.lock = threading.Lock()
+
+    def effective_priority(self, priority, waited_seconds):
+        """Priority level after aging"""
+        promotions = int(waited_seconds // self.aging_seconds) if self.aging_seconds else 0
+        return PRIORITIES[max(0, PRIORITIES.index(priority) - promotions)]
+
+    def choose(self, head_waits):
+        """Pick a priority given the wait (seconds) of each queue's oldest item, or None if empty"""
+        weights = {
+            priority: self.weights[self.effective_priority(priority, waited)]
+            for priority, waited in head_waits.items()
+            if waited is not None
+        }
+        if not weights:
+            return None
+
+        with self.lock:
+            for priority, weight in weights.items():
+                self.current[priority] += weight
+            chosen = max(weights, key=lambda p: (self.current[p], -PRIORITIES.index(p)))
+            self.current[chosen] -= sum(weights.values())
+
+        return chosen
+
+
+def summarize_waits(waits, dispatched, sla_missed, sla_seconds):
+    """Summarize recent dispatch wait times for one priority level"""
+    waits = sorted(waits)
+    return {
+        "dispatched": dispatched,
+        "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+        "p95_wait": waits[max(0, math.ceil(len(waits) * 0.95) - 1)] if waits else 0.0,
+        "max_wait": waits[-1] if waits else 0.0,
+        "sla_seconds": sla_seconds,
+        "sla_missed": sla_missed
+    }
+
@@ -0,0 +1,40 @@
+import os
+
+from agents import ClassifierAgent, split_email_messages
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return f.read()
+
+
+def test_quoted_reply_is_one_message():
+    reply = read_fixture("quoted_reply.txt")
+
+    assert list(split_email_messages(reply)) == [reply]
+    assert ClassifierAgent(model=None).classify_format(reply, "reply.txt") == {"format": "Email", "intent": None}
+
+
+def test_forwarded_message_is_one_message():
+    forward = read_fixture("forwarded.txt")
+
+    assert list(split_email_messages(forward)) == [forward]
+    assert ClassifierAgent(model=None).classify_format(forward, "forward.txt") == {"format": "Email", "intent": None}
+
+
+def test_concatenated_messages_are_split():
+    first = "From: a@example.com\nDate: Mon, 3 Jun 2024 10:00:00 +0000\nSubject: One\n\nFirst body\n\n"
+    second = "From: b@example.com\nMessage-ID: <2@example.com>\nSubject: Two\n\nSecond body\n"
+
+    assert list(split_email_messages(first + second)) == [first, second]
+
+
+def test_mbox_messages_are_split():
+    mbox = ("From a@example.com Mon Jun  3 10:00:00 2024\nFrom: a@example.com\nSubject: One\n\nBody\n\n"
+            "From b@example.com Mon Jun  3 11:00:00 2024\nFrom: b@example.com\nSubject: Two\n\n>From here\n")
+
+    messages = list(split_email_messages(mbox))
+    assert len(messages) == 2
+    assert messages[1].endswith("From here\n")
@@ -0,0 +1,24 @@
+from compress import PAGE_BREAK, compress_pdf_text
+
+
+def test_repeated_page_edges_keep_first_occurrence():
+    pages = [
+        f"ACME Corp Ltd\n12 Main St\nInvoice INV-{i}\nConfidential - Page {i} of 3"
+        for i in (1, 2, 3)
+    ]
+    text = compress_pdf_text("".join(f"{page}\n{PAGE_BREAK}\n" for page in pages), record=False).text
+
+    assert text.count("ACME Corp Ltd") == 1
+    assert text.count("12 Main St") == 1
+    assert text.count("Confidential - Page") == 1
+    assert all(f"Invoice INV-{i}" in text for i in (1, 2, 3))
+
+
+def test_bare_numbers_inside_a_page_are_kept():
+    text = "Widget\n25\n4.00\nGadget\n10\n5.00\nTotal: 150.00\n3\n" + PAGE_BREAK + "\n"
+
+    lines = compress_pdf_text(text, record=False).text.splitlines()
+
+    assert "25" in lines
+    assert "10" in lines
+    assert "3" not in lines
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import pytest
+
+from llm_client import AdaptiveConcurrencyLimiter, CircuitBreaker, CircuitOpenError, LLMUnavailableError, ResilientModel
+
+
+class HangingModel:
+    """A model whose calls only return once `release` is set"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def generate_content(self, prompt, **kwargs):
+        self.release.wait()
+
+
+def test_breaker_opens_when_upstream_hangs():
+    hanging = HangingModel()
+    # The first call times out and keeps the only slot; the second times out waiting for it
+    model = ResilientModel(hanging, timeout=0.1, max_retries=0,
+                           limiter=AdaptiveConcurrencyLimiter(initial_limit=1),
+                           breaker=CircuitBreaker(failure_threshold=2))
+    try:
+        for _ in range(2):
+            with pytest.raises(LLMUnavailableError):
+                model.generate_content("prompt")
+        assert model.stats()["circuit"] == "open"
+
+        start = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            model.generate_content("prompt")
+        assert time.perf_counter() - start < 0.05
+    finally:
+        hanging.release.set()
+
+
+def test_ignored_trial_reopens_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 11.0
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+    breaker.record_ignored()
+
+    assert breaker.state == "open"
+    assert breaker.opened_at == 0.0
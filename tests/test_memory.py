@@ -0,0 +1,15 @@
+from memory import InMemoryStorage
+
+
+def test_rewrites_are_counted_once():
+    memory = InMemoryStorage()
+    invoice = {"sender": "billing@acme.com", "entities": {"total_amount": "$1,200.00"}}
+    for _ in range(3):
+        memory.store_document_data("doc-1", "invoice.txt", "Email", "Invoice", invoice)
+    memory.store_document_data("doc-2", "rfq.txt", "Email", "RFQ", {"sender": "billing@acme.com"})
+
+    stats = memory.get_analytics()
+    assert stats["docs"] == 2
+    assert stats["invoices"] == 1
+    assert stats["invoice_total"] == 1200.0
+    assert stats["top_senders"] == [("billing@acme.com", 2)]
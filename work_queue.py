@@ -0,0 +1,266 @@
+import json
+import time
+import uuid
+from datetime import datetime
+
+import redis
+
+from scheduler import PRIORITIES, DEFAULT_SLA_SECONDS, WeightedAgingPolicy, compute_priority, summarize_waits
+
+
+class DocumentQueue:
+    """Redis Streams work queue for documents awaiting processing
+
+    Uploads are appended to a stream and consumed by worker processes through a
+    consumer group. A message is only acknowledged once its result is stored, so
+    a crashed or failing worker leaves it pending; it is reclaimed by another
+    worker after `claim_idle_ms` and moved to the dead-letter stream once it has
+    been attempted `max_attempts` times. Job state lives in a `job:<id>` hash
+    that the UI polls for completion.
+
+    Each priority level has its own stream. Workers pick the stream to serve
+    with a WeightedAgingPolicy, using the age of the oldest undelivered entry
+    (encoded in its stream id) so that low-priority documents are not starved.
+    """
+
+    def __init__(self, redis_client, stream="docs:jobs", group="doc-workers",
+                 max_attempts=3, claim_idle_ms=60000, policy=None, sla_seconds=None,
+                 metrics_window=1000):
+        self.redis_client = redis_client
+        self.stream = stream
+        self.streams = {priority: f"{stream}:{priority.lower()}" for priority in PRIORITIES}
+        self.group = group
+        self.dead_letter_stream = f"{stream}:dead"
+        self.max_attempts = max_attempts
+        self.claim_idle_ms = claim_idle_ms
+        self.policy = policy or WeightedAgingPolicy()
+        self.sla_seconds = sla_seconds or DEFAULT_SLA_SECONDS
+        self.metrics_window = metrics_window
+
+    def ensure_group(self):
+        """Create the consumer group (and streams) if they do not exist yet"""
+        for stream in self.streams.values():
+            try:
+                self.redis_client.xgroup_create(stream, self.group, id="0", mkstream=True)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    def enqueue(self, file_name, file_content, conversation_id=None, priority=None):
+        """Add a document to the queue and return its job id"""
+        job_id = str(uuid.uuid4())
+        conversation_id = conversation_id or job_id
+        priority = priority or compute_priority(file_content, file_name)
+        if not isinstance(file_content, (bytes, str)):
+            # Memory-mapped uploads are copied once, into the stream entry
+            file_content = bytes(file_content)
+
+        pipe = self.redis_client.pipeline()
+        pipe.hset(f"job:{job_id}", mapping={
+            "status": "queued",
+            "file_name": file_name,
+            "conversation_id": conversation_id,
+            "priority": priority,
+            "attempts": 0,
+            "enqueued_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        pipe.xadd(self.streams[priority], {
+            "job_id": job_id,
+            "conversation_id": conversation_id,
+            "file_name": file_name,
+            "priority": priority,
+            "content": file_content
+        })
+        pipe.execute()
+
+        return job_id
+
+    def get_job(self, job_id):
+        """Retrieve the state of a job, or None if it is unknown"""
+        data = self.redis_client.hgetall(f"job:{job_id}")
+        if not data:
+            return None
+
+        job = {}
+        for k, v in data.items():
+            k_str = k.decode('utf-8') if isinstance(k, bytes) else k
+            v_str = v.decode('utf-8') if isinstance(v, bytes) else v
+            if k_str in ("classification", "result"):
+                v_str = json.loads(v_str)
+            job[k_str] = v_str
+
+        return job
+
+    def wait_for_job(self, job_id, timeout=300, poll_interval=0.5):
+        """Poll a job until it is done or dead-lettered; returns None on timeout"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.get_job(job_id)
+            if job and job["status"] in ("done", "dead"):
+                return job
+            time.sleep(poll_interval)
+
+        return None
+
+    def read(self, consumer, count=1, block_ms=5000):
+        """Fetch jobs for a consumer, reclaiming stale ones from dead workers first"""
+        for stream in self.streams.values():
+            # Redis 6.2 replies with [cursor, messages], 7.0+ adds deleted ids
+            claimed = self.redis_client.xautoclaim(
+                stream, self.group, consumer, self.claim_idle_ms, start_id="0-0", count=count
+            )[1]
+            messages = [(message_id, fields) for message_id, fields in claimed if fields]
+            if messages:
+                return [self._decode_message(stream, message_id, fields) for message_id, fields in messages]
+
+        priority = self.policy.choose(self._head_waits())
+        if priority is not None:
+            streams = {self.streams[priority]: ">"}
+            block_ms = None
+        else:
+            # Nothing waiting anywhere; block until any stream receives work
+            streams = {stream: ">" for stream in self.streams.values()}
+
+        response = self.redis_client.xreadgroup(self.group, consumer, streams, count=count, block=block_ms)
+        return [
+            self._decode_message(stream, message_id, fields)
+            for stream, stream_messages in response or []
+            for message_id, fields in stream_messages
+        ]
+
+    def _head_waits(self):
+        """Seconds the oldest undelivered entry of each priority stream has waited"""
+        pipe = self.redis_client.pipeline()
+        for stream in self.streams.values():
+            pipe.xinfo_groups(stream)
+        groups = pipe.execute()
+
+        pipe = self.redis_client.pipeline()
+        for stream, stream_groups in zip(self.streams.values(), groups):
+            last_delivered = next(
+                (g["last-delivered-id"] for g in stream_groups if g["name"] in (self.group, self.group.encode())),
+                b"0-0"
+            )
+            if isinstance(last_delivered, bytes):
+                last_delivered = last_delivered.decode('utf-8')
+            pipe.xrange(stream, min=f"({last_delivered}", count=1)
+
+        now_ms = time.time() * 1000
+        head_waits = {}
+        for priority, entries in zip(self.streams, pipe.execute()):
+            head_waits[priority] = (now_ms - self._entry_time_ms(entries[0][0])) / 1000 if entries else None
+
+        return head_waits
+
+    def start_attempt(self, job):
+        """Record a processing attempt; returns False if the job should not be processed"""
+        key = f"job:{job['job_id']}"
+        status = self.redis_client.hget(key, "status")
+        if status in (b"done", b"dead"):
+            # Already completed by an earlier delivery
+            self.ack(job)
+            return False
+
+        attempts = self.redis_client.hincrby(key, "attempts", 1)
+        if attempts > self.max_attempts:
+            self.dead_letter(job, "Exceeded maximum attempts")
+            return False
+
+        pipe = self.redis_client.pipeline()
+        pipe.hset(key, "status", "processing")
+        if attempts == 1:
+            self._record_wait(pipe, job)
+        pipe.execute()
+        return True
+
+    def _record_wait(self, pipe, job):
+        """Record the time a job waited between enqueue and its first dispatch"""
+        waited = time.time() - self._entry_time_ms(job["message_id"]) / 1000
+        priority = job["priority"]
+        metrics_key = f"{self.stream}:metrics:{priority.lower()}"
+
+        pipe.hincrby(metrics_key, "dispatched", 1)
+        if waited > self.sla_seconds[priority]:
+            pipe.hincrby(metrics_key, "sla_missed", 1)
+        pipe.lpush(f"{metrics_key}:waits", waited)
+        pipe.ltrim(f"{metrics_key}:waits", 0, self.metrics_window - 1)
+
+    def metrics(self):
+        """Queue depth and wait-time statistics per priority, across all workers"""
+        pipe = self.redis_client.pipeline()
+        for priority, stream in self.streams.items():
+            metrics_key = f"{self.stream}:metrics:{priority.lower()}"
+            pipe.xlen(stream)
+            pipe.hgetall(metrics_key)
+            pipe.lrange(f"{metrics_key}:waits", 0, -1)
+        results = pipe.execute()
+
+        metrics = {}
+        for i, priority in enumerate(PRIORITIES):
+            depth, counters, waits = results[i * 3:i * 3 + 3]
+            metrics[priority] = dict(
+                summarize_waits(
+                    [float(w) for w in waits],
+                    int(counters.get(b"dispatched", 0)),
+                    int(counters.get(b"sla_missed", 0)),
+                    self.sla_seconds[priority]
+                ),
+                depth=depth
+            )
+
+        return metrics
+
+    def complete(self, job, classification, result):
+        """Mark a job done and acknowledge its stream entry"""
+        self.redis_client.hset(f"job:{job['job_id']}", mapping={
+            "status": "done",
+            "classification": json.dumps(classification),
+            "result": json.dumps(result),
+            "completed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        self.ack(job)
+
+    def fail(self, job, error):
+        """Record a failed attempt; the entry stays pending and is retried after claim_idle_ms"""
+        self.redis_client.hset(f"job:{job['job_id']}", mapping={
+            "status": "retrying",
+            "error": str(error)
+        })
+
+    def dead_letter(self, job, error):
+        """Move a job to the dead-letter stream"""
+        pipe = self.redis_client.pipeline()
+        pipe.xadd(self.dead_letter_stream, {
+            "job_id": job["job_id"],
+            "conversation_id": job["conversation_id"],
+            "file_name": job["file_name"],
+            "priority": job["priority"],
+            "content": job["content"],
+            "error": str(error)
+        })
+        pipe.hset(f"job:{job['job_id']}", mapping={"status": "dead", "error": str(error)})
+        pipe.execute()
+        self.ack(job)
+
+    def ack(self, job):
+        """Acknowledge a job's stream entry and drop its payload"""
+        pipe = self.redis_client.pipeline()
+        pipe.xack(job["stream"], self.group, job["message_id"])
+        pipe.xdel(job["stream"], job["message_id"])
+        pipe.execute()
+
+    def _entry_time_ms(self, message_id):
+        """Enqueue time encoded in a stream entry id"""
+        if isinstance(message_id, bytes):
+            message_id = message_id.decode('utf-8')
+        return int(message_id.split("-")[0])
+
+    def _decode_message(self, stream, message_id, fields):
+        """Convert a raw stream entry into a job dict"""
+        job = {"stream": stream, "message_id": message_id}
+        for k, v in fields.items():
+            k_str = k.decode('utf-8') if isinstance(k, bytes) else k
+            # The document content stays as bytes for the agents
+            job[k_str] = v if k_str == "content" or not isinstance(v, bytes) else v.decode('utf-8')
+
+        return job
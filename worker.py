@@ -0,0 +1,104 @@
+"""Queue worker entry point
+
+Runs the document pipeline against the Redis Streams work queue:
+
+    python worker.py --redis-url redis://localhost:6379/0 --processes 4
+
+Start as many workers on as many machines as needed; they share the consumer
+group, so each queued document is processed by exactly one of them.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+
+import redis
+from dotenv import load_dotenv
+
+import resources
+from memory import RedisMemory
+from pipeline import DocumentPipeline
+from work_queue import DocumentQueue
+
+
+def build_pipeline(redis_client):
+    """Create the pipeline used by a worker process, storing results in Redis"""
+    agents = resources.get_agents()
+    return DocumentPipeline(
+        agents["classifier"],
+        agents["json"],
+        agents["email"],
+        agents["pdf"],
+        RedisMemory(client=redis_client)
+    )
+
+
+def run_worker(redis_url, consumer, max_attempts, claim_idle_ms):
+    """Consume jobs until the process is asked to stop"""
+    redis_client = redis.Redis.from_url(redis_url)
+    queue = DocumentQueue(redis_client, max_attempts=max_attempts, claim_idle_ms=claim_idle_ms)
+    queue.ensure_group()
+    pipeline = build_pipeline(redis_client)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"[{consumer}] waiting for jobs on {queue.stream}")
+    while not stopping:
+        for job in queue.read(consumer):
+            if not queue.start_attempt(job):
+                continue
+            try:
+                output = pipeline.process(job["conversation_id"], job["content"], job["file_name"])
+            except Exception as e:
+                print(f"[{consumer}] job {job['job_id']} failed: {e}")
+                queue.fail(job, e)
+                continue
+            queue.complete(job, output["classification"], output["result"])
+            print(f"[{consumer}] job {job['job_id']} ({job['priority']}) done")
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Process queued documents")
+    parser.add_argument("--redis-url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start on this machine")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts before a job is dead-lettered")
+    parser.add_argument("--claim-idle-ms", type=int, default=60000,
+                        help="Idle time before a pending job is reclaimed from another worker")
+    args = parser.parse_args()
+
+    consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+    if args.processes == 1:
+        run_worker(args.redis_url, f"{consumer_prefix}-0", args.max_attempts, args.claim_idle_ms)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(args.redis_url, f"{consumer_prefix}-{i}", args.max_attempts, args.claim_idle_ms)
+        )
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Let the workers finish their current job
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+if __name__ == "__main__":
+    main()